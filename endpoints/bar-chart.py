@@ -1,14 +1,12 @@
 from math import ceil, log10, floor
 from typing import Optional, List, Dict
 
-from PIL import Image, ImageDraw
-
 from handlers.handler import Handler, GraphHandler
 from utility.colour import as_rgb_tuple
 from utility.error import ErrorCode
-from utility.image import get_font_asset, get_image_response, get_image, resize_to_ratio, get_font_optimal, \
-    get_image_asset
+from utility.image import get_font_asset, resize_to_ratio, get_font_optimal, get_images_or_assets, get_text_width
 from utility.response import BadRequest
+from utility.scene import Scene, get_scene_response
 
 
 class BarGraphHandler(GraphHandler):
@@ -58,11 +56,9 @@ class BarGraphHandler(GraphHandler):
         graph_width, graph_height = width + excess, height + excess
         bar_offset = 25 * multiplier
 
-        image = Image.new("RGBA", (width + excess * 2, height + excess * 2), (0, 0, 0, 0))
-
-        draw = ImageDraw.Draw(image)
-        draw.rectangle((excess, excess, graph_width, graph_height), fill=self.surface_colour_alpha(10),
-                       outline=self.accent_colour_alpha(255), width=1 * multiplier)
+        scene = Scene((width + excess * 2, height + excess * 2), render_mode=self.render_mode)
+        scene.rectangle((excess, excess, graph_width, graph_height), fill=self.surface_colour_alpha(10),
+                        outline=self.accent_colour_alpha(255), width=1 * multiplier)
 
         axis_font = get_font_asset("roboto/RobotoMono-Bold.ttf", 10 * multiplier)
 
@@ -93,9 +89,12 @@ class BarGraphHandler(GraphHandler):
         x_change = width - bar_offset * 2 if len(bars) == 1 else (width - (bar_offset * (len(bars) + 1))) / len(bars)
 
         font_sizes = [(get_font_optimal("roboto/RobotoMono-Bold.ttf", 20 * multiplier, bar.get("name"), x_change * 0.9), bar.get("name")) for bar in bars if bar.get("name")]
-        bar_font = min(font_sizes, key=lambda f: f[0].getsize(f[1])[0])[0]
+        bar_font = min(font_sizes, key=lambda f: get_text_width(*f))[0]
         image_font_height = bar_font.getsize("a")[1]
 
+        icon_indexes = [index for index, data in enumerate(bars) if data.get("icon")]
+        icons = dict(zip(icon_indexes, get_images_or_assets([(bars[index].get("icon"), f"bars.{index}.icon", "field") for index in icon_indexes])))
+
         for index, data in enumerate(bars):
             value = data.get("value")
             if value is None:
@@ -110,57 +109,40 @@ class BarGraphHandler(GraphHandler):
 
             if name:
                 font_width, font_height = bar_font.getsize(name)
-                draw.text((x + x_change / 2 - font_width / 2, graph_height + (excess * 0.07)), name, font=bar_font, fill=self.accent_colour_alpha(255))
+                scene.text((x + x_change / 2 - font_width / 2, graph_height + (excess * 0.07)), name, font=bar_font, fill=self.accent_colour_alpha(255))
 
             if icon_url:
                 icon_size = min(excess * 0.75 - image_font_height, x_change * 0.25)
+                icon = resize_to_ratio(icons[index], (icon_size, icon_size)).convert("RGBA")
 
-                try:
-                    icon = get_image_asset(icon_url)
-                except:
-                    icon = get_image(icon_url, f"bars.{index}.icon", "field")
-
-                icon = resize_to_ratio(icon, (icon_size, icon_size)).convert("RGBA")
-
-                image.paste(icon, (int(x + x_change / 2 - icon.size[0] / 2), int(graph_height + (excess * 0.07 + (image_font_height if name else 0) * 1.4))), icon)
+                scene.paste(icon, (int(x + x_change / 2 - icon.size[0] / 2), int(graph_height + (excess * 0.07 + (image_font_height if name else 0) * 1.4))), icon)
 
             colour = as_rgb_tuple(colour) if colour is not None else (255, 0, 0)
 
-            draw.rectangle((x, graph_height, x + x_change, y), outline=colour + (255,), fill=colour + (100,), width=2 * multiplier)
+            scene.rectangle((x, graph_height, x + x_change, y), outline=colour + (255,), fill=colour + (100,), width=2 * multiplier)
 
         log_value = 0 if change == 0 else log10(abs(change))
         digits = ceil(abs(log_value)) if log_value < 0 else 0
 
         for index in range(y_points):
             y = (height / (y_points - 1) * index) + excess
-            draw.line((excess - point_length, y, graph_width, y), fill=self.accent_colour_alpha(255), width=1 * multiplier)
+            scene.line((excess - point_length, y, graph_width, y), fill=self.accent_colour_alpha(255), width=1 * multiplier)
 
             value = max_value - (index * change)
 
             text = f"{value_prefix}{value:.{digits}f}{value_suffix}"
             font_width, font_height = axis_font.getsize(text)
 
-            draw.text((excess - (excess / 5) - font_width, y - font_height / 1.8), text, font=axis_font, fill=self.accent_colour_alpha(255))
+            scene.text((excess - (excess / 5) - font_width, y - font_height / 1.8), text, font=axis_font, fill=self.accent_colour_alpha(255))
 
         if x_header and y_header:
             font = get_font_asset("roboto/RobotoMono-Regular.ttf", excess - (25 * multiplier))
             x_font_width, x_font_height = font.getsize(x_header)
             y_font_width, y_font_height = font.getsize(y_header)
 
-            font_image = Image.new("RGBA", (y_font_width, y_font_height), (0, 0, 0, 0))
-            font_draw = ImageDraw.Draw(font_image)
-            font_draw.text((0, 0), y_header, font=font, fill=self.accent_colour_alpha(255))
-
-            font_image = font_image.rotate(270, expand=1)
-
-            image.paste(font_image,
-                        (int(width + excess * 2 - y_font_height), int(((height + excess * 2) - y_font_width) / 2)))
-            draw.text((((width + excess * 2) - x_font_width) / 2, excess - (excess / 7) - x_font_height), x_header,
-                      font=font, fill=self.accent_colour_alpha(255))
-
-        image = image.resize((actual_width, actual_height), Image.LANCZOS)
-
-        final_image = Image.new("RGB", (actual_width, actual_height), self.background_colour)
-        final_image.paste(image, (0, 0), image)
+            scene.vertical_text((int(width + excess * 2 - y_font_height), int(((height + excess * 2) - y_font_width) / 2)),
+                                y_header, font=font, fill=self.accent_colour_alpha(255))
+            scene.text((((width + excess * 2) - x_font_width) / 2, excess - (excess / 7) - x_font_height), x_header,
+                       font=font, fill=self.accent_colour_alpha(255))
 
-        return get_image_response([final_image])
\ No newline at end of file
+        return get_scene_response(scene, (actual_width, actual_height), self.background_colour)
\ No newline at end of file
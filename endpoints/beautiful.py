@@ -18,4 +18,7 @@ class BeautifulHandler(SingleImageHandler):
 
             return copy
 
-        return get_image_response(for_each_frame(image, parse), transparency=255)
+        return get_image_response(for_each_frame(image, parse, stream=True), transparency=255)
+
+    def target_size(self):
+        return 90, 104
@@ -1,3 +1,5 @@
+from functools import partial
+
 import numpy as np
 
 from PIL import Image
@@ -8,16 +10,17 @@ from handlers.handler import SingleImageHandler
 from utility.image import get_image_response, for_each_frame
 
 
+def parse(frame, gif):
+    canny = feature.canny(rgb2gray(np.array(frame.convert("RGB"), dtype=np.uint8)), sigma=1)
+    if gif:
+        canny = np.uint8(canny)
+
+    return Image.fromarray(canny)
+
+
 class CannyHandler(SingleImageHandler):
 
     def on_request(self, image):
         gif = image.n_frames > 1
 
-        def parse(frame):
-            canny = feature.canny(rgb2gray(np.array(frame.convert("RGB"), dtype=np.uint8)), sigma=1)
-            if gif:
-                canny = np.uint8(canny)
-
-            return Image.fromarray(canny)
-
-        return get_image_response(for_each_frame(image, parse))
+        return get_image_response(for_each_frame(image, partial(parse, gif=gif), parallel=True))
@@ -1,11 +1,11 @@
-from typing import Optional
+from typing import Optional, Tuple, List
 
 from PIL import Image
 
 from handlers.handler import Handler
 from utility.colour import as_rgb_tuple
 from utility.error import ErrorCode
-from utility.image import get_image_response
+from utility.image import get_image_response, ImageInfo
 from utility.response import BadRequest
 
 
@@ -18,13 +18,21 @@ class ColourHandler(Handler):
         self.queries = [(["width", "w"], Optional[int]), (["height", "h"], Optional[int]), (["colour", "color"], int)]
         self.require_authorization = False
 
-    def on_request(self):
-        colour = self.query("colour", int, 0) or self.query("color", int, 0)
-
+    def get_size(self) -> Tuple[int, int]:
         width = self.query("width", int) or self.query("w", int) or 100
         height = self.query("height", int) or self.query("h", int) or 100
 
         if width > 5000 or height > 5000:
             raise BadRequest("Neither width or height can be more than 5000 pixels in size", ErrorCode.INVALID_QUERY_VALUE)
 
-        return get_image_response([Image.new("RGB", (width, height), as_rgb_tuple(colour))])
+        return width, height
+
+    def estimate_cost(self, images: List[ImageInfo]) -> int:
+        width, height = self.get_size()
+
+        return super().estimate_cost(images) + width * height
+
+    def on_request(self):
+        colour = self.query("colour", int, 0) or self.query("color", int, 0)
+
+        return get_image_response([Image.new("RGB", self.get_size(), as_rgb_tuple(colour))])
@@ -1,9 +1,11 @@
-import json
+from typing import Optional
 
+import numpy as np
 from flask import Response
 
 from handlers.handler import SingleImageHandler
-from utility.colour import as_rgb
+from utility.error import ErrorCode
+from utility.response import BadRequest
 
 
 class CommonColourHandler(SingleImageHandler):
@@ -12,23 +14,43 @@ class CommonColourHandler(SingleImageHandler):
         super().__init__(app)
 
         self.aliases = ["common-color"]
+        self.queries += [(["limit"], Optional[int]), (["bits"], Optional[int])]
 
     def on_request(self, image):
-        image = image.convert("RGB")
+        limit = self.query("limit", int)
+        bits = self.query("bits", int, 8)
 
-        pixels = image.load()
+        if limit is not None and limit < 1:
+            raise BadRequest("limit has to be a value more than 0", ErrorCode.INVALID_QUERY_VALUE)
 
-        data = {}
-        for x in range(0, image.size[0]):
-            for y in range(0, image.size[1]):
-                colour = as_rgb(pixels[x, y])
+        if bits < 1 or bits > 8:
+            raise BadRequest("bits has to be a value between 1 and 8", ErrorCode.INVALID_QUERY_VALUE)
 
-                value = data.get(colour)
-                if not value:
-                    data[colour] = 1
-                else:
-                    data[colour] += 1
+        shift = 8 - bits
+        pixels = (np.asarray(image.convert("RGB")).reshape(-1, 3) >> shift).astype(np.uint32)
+        packed = pixels[:, 0] << (bits * 2) | pixels[:, 1] << bits | pixels[:, 2]
 
-        colours = [{"colour": key, "pixels": value} for key, value in sorted(data.items(), key=lambda item: item[1], reverse=True)]
+        if bits == 8:
+            colours, counts = np.unique(packed, return_counts=True)
+        else:
+            counts = np.bincount(packed, minlength=1 << (bits * 3))
+            colours = np.flatnonzero(counts).astype(np.uint32)
+            counts = counts[colours]
 
-        return Response(status=200, response=json.dumps({"status": 200, "colours": colours}), content_type="application/json")
\ No newline at end of file
+            mask = (1 << bits) - 1
+            colours = (colours >> (bits * 2) & mask) << (16 + shift) | (colours >> bits & mask) << (8 + shift) | (colours & mask) << shift
+
+        order = np.argsort(-counts, kind="stable")[:limit]
+
+        def generate():
+            yield '{"status": 200, "colours": ['
+
+            for i in range(0, len(order), 1024):
+                chunk = order[i:i + 1024]
+                entries = ", ".join(f'{{"colour": {colour}, "pixels": {count}}}' for colour, count in zip(colours[chunk].tolist(), counts[chunk].tolist()))
+
+                yield entries if i == 0 else ", " + entries
+
+            yield "]}"
+
+        return Response(status=200, response=generate(), content_type="application/json")
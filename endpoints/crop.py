@@ -43,6 +43,7 @@ class CropHandler(SingleImageHandler):
         left = image_width / 2 - width / 2
         upper = image_height / 2 - height / 2
 
-        frames = for_each_frame(image, lambda frame: frame.crop((left, upper, width + left, height + upper)))
+        frames = for_each_frame(image, lambda frame: frame.crop((left, upper, width + left, height + upper)),
+                                stream=True)
 
         return get_image_response(frames)
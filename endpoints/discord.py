@@ -6,8 +6,8 @@ from PIL import ImageFont, Image, ImageDraw
 from handlers.handler import SingleImageHandler
 from utility.colour import as_rgb_tuple
 from utility.error import ErrorCode
-from utility.image import get_font_asset, get_image_asset, get_text_array, get_image_response, get_image, \
-    for_each_frame, create_avatar, resize_to_ratio
+from utility.image import get_font_asset, get_image_asset, get_text_lines, get_text_width, get_image_response, \
+    get_images, for_each_frame, create_avatar, resize_to_ratio
 from utility.response import BadRequest
 
 
@@ -26,7 +26,7 @@ class TextType:
         self.data = {} if data is None else data
 
     def width(self, font: ImageFont = None) -> int:
-        return 35 if self.mention_type == 4 else font.getsize(self.string)[0]
+        return 35 if self.mention_type == 4 else get_text_width(font, self.string)
 
     @property
     def mention(self):
@@ -137,6 +137,9 @@ class DiscordHandler(SingleImageHandler):
         if len(builder) != 0:
             text_types.append(TextType("".join(builder), 0, None))
 
+        emote_urls = list({str(text_type) for text_type in text_types if text_type.mention_type == 4})
+        emote_images = dict(zip(emote_urls, get_images([(url, "emotes", "field") for url in emote_urls])))
+
         blank = Image.new("RGBA", (1000, 400), (0, 0, 0, 0))
 
         draw = ImageDraw.Draw(blank)
@@ -166,7 +169,7 @@ class DiscordHandler(SingleImageHandler):
                     text_colour = (222, 224, 252) if dark_theme else (80, 92, 220)
 
                 if text_type.mention_type == 4:
-                    emote = resize_to_ratio(get_image(str(text_type)).convert("RGBA"), (35, 35))
+                    emote = resize_to_ratio(emote_images[str(text_type)].convert("RGBA"), (35, 35))
                     blank.paste(emote, (width + 160, height + 6), emote)
                 else:
                     draw.rectangle((width + 160, height + 5, width + 160 + text_type_width, height + 37), mention_box_colour)
@@ -174,12 +177,12 @@ class DiscordHandler(SingleImageHandler):
 
                 width += text_type_width
             else:
-                lines = get_text_array(str(text_type), text_font, 820, width, False)
-                for i, line in enumerate(lines):
+                lines = get_text_lines(str(text_type), text_font, 820, width, False)
+                for i, (line, line_width) in enumerate(lines):
                     draw.text((width + 160, height), line, (220, 221, 222) if dark_theme else (116, 127, 141), text_font)
 
                     if i == len(lines) - 1:
-                        width += text_font.getsize(line)[0]
+                        width += line_width
                     else:
                         if i == 0:
                             width = 0
@@ -201,3 +204,9 @@ class DiscordHandler(SingleImageHandler):
 
     def image_queries(self):
         return [("avatar", True, False)]
+
+    def cache_bucket(self):
+        return datetime.utcnow().strftime("%Y-%m-%d %H:%M")
+
+    def target_size(self):
+        return 100, 100
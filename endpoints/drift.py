@@ -17,7 +17,7 @@ class DriftHandler(SingleImageHandler):
         left_text = self.query("left_text")
         right_text = self.query("right_text")
 
-        background = get_image_asset("drift-meme.png")
+        background = get_image_asset("drift-meme.png").copy()
         font = get_font_asset("arialuni.ttf", 20)
 
         background.paste(avatar, (270, 335), avatar)
@@ -30,5 +30,8 @@ class DriftHandler(SingleImageHandler):
 
         return get_image_response([background])
 
+    def target_size(self):
+        return 23, 23
+
     def modify_images(self, images):
         return images[0].convert("RGBA").resize((23, 23))
@@ -39,7 +39,7 @@ class EndpointsHandler(Handler):
 
     def on_request(self):
         builder = []
-        for endpoint in self.app.endpoints:
+        for endpoint in self.app.endpoints.handlers():
             builder.append("<header><h1><u>")
             builder.append(endpoint.name)
             builder.append("</u></h1></header>")
@@ -15,4 +15,7 @@ class FearHandler(SingleImageHandler):
 
             return copy
 
-        return get_image_response(for_each_frame(image, parse))
+        return get_image_response(for_each_frame(image, parse, stream=True))
+
+    def target_size(self):
+        return 251, 251
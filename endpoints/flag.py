@@ -32,4 +32,4 @@ class FlagHandler(SingleImageHandler):
 
             return Image.blend(frame, flag_image, 0.35)
 
-        return get_image_response(for_each_frame(image, parse), transparency=255)
+        return get_image_response(for_each_frame(image, parse, stream=True), transparency=255)
@@ -15,4 +15,4 @@ class GayHandler(SingleImageHandler):
 
             return frame
 
-        return get_image_response(for_each_frame(image, parse), transparency=255)
+        return get_image_response(for_each_frame(image, parse, stream=True), transparency=255)
@@ -1,9 +1,13 @@
-import colorsys
-from typing import Optional
+from typing import Optional, List
+
+import numpy as np
+from PIL import Image
 
 from handlers.handler import SingleImageHandler
 from utility.error import ErrorCode
-from utility.image import max_pixels, get_image_response
+from utility.admission import REQUEST_BASE_COST
+from utility.image import max_pixels, get_image_response, ImageInfo
+from utility.kernel import rgb_to_hsv, shift_hue, apply_palette_kernel
 from utility.response import BadRequest
 
 
@@ -14,27 +18,32 @@ class HueHandler(SingleImageHandler):
 
         self.queries = [(["frames"], Optional[int])]
 
-    def on_request(self, image):
+    def get_frame_count(self) -> int:
         frame_count = self.query("frames", int) or 60
-        if frame_count > 100:
-            raise BadRequest("Frame count cannot be more than 100", ErrorCode.INVALID_QUERY_VALUE)
+        if frame_count > 200:
+            raise BadRequest("Frame count cannot be more than 200", ErrorCode.INVALID_QUERY_VALUE)
+
+        return frame_count
 
-        final_size = max_pixels(image.size, 100)
-        image = image.convert("RGBA").resize(final_size)
+    def estimate_cost(self, images: List[ImageInfo]) -> int:
+        # only the first frame is used, every output frame is at most 200x200
+        width, height = images[0].size
 
-        frames = []
-        for i in range(0, frame_count):
-            copy = image.copy()
-            pixels = copy.load()
-            for x in range(0, image.size[0]):
-                for y in range(0, image.size[1]):
-                    r, g, b, a = pixels[x, y]
+        return REQUEST_BASE_COST + width * height + self.get_frame_count() * 200 * 200
+
+    def on_request(self, image):
+        frame_count = self.get_frame_count()
 
-                    h, s, v = colorsys.rgb_to_hsv(r / 255, g / 255, b / 255)
-                    nr, ng, nb = colorsys.hsv_to_rgb(((h * 360 + i * 360 / frame_count) % 360) / 360, s, v)
+        final_size = max_pixels(image.size, 200)
+        if image.mode == "P" and final_size == image.size:
+            def shift(degrees):
+                return lambda pixels: shift_hue(pixels, rgb_to_hsv(pixels), degrees)
 
-                    pixels[x, y] = (int(nr * 255), int(ng * 255), int(nb * 255), a)
+            frames = [apply_palette_kernel(image, shift(i * 360 / frame_count)) for i in range(0, frame_count)]
+        else:
+            pixels = np.asarray(image.convert("RGBA").resize(final_size))
+            hsv = rgb_to_hsv(pixels)
 
-            frames.append(copy)
+            frames = [Image.fromarray(shift_hue(pixels, hsv, i * 360 / frame_count), "RGBA") for i in range(0, frame_count)]
 
         return get_image_response(frames, transparency=255)
@@ -1,5 +1,6 @@
 from handlers.handler import SingleImageHandler
 from utility.image import get_image_response, max_pixels, for_each_frame
+from utility.kernel import apply_kernel, apply_palette_kernel, invert
 
 
 class InvertHandler(SingleImageHandler):
@@ -8,14 +9,11 @@ class InvertHandler(SingleImageHandler):
         final_size = max_pixels(image.size, 500)
 
         def parse(frame):
-            frame = frame.convert("RGBA").resize(final_size)
+            return apply_kernel(frame.convert("RGBA").resize(final_size), invert)
 
-            pixels = frame.load()
-            for x in range(0, frame.size[0]):
-                for y in range(0, frame.size[1]):
-                    r, g, b, a = pixels[x, y]
-                    pixels[x, y] = (255 - r, 255 - g, 255 - b, a)
+        def parse_palette(frame):
+            return apply_palette_kernel(frame, invert)
 
-            return frame
+        frames = for_each_frame(image, parse, parse_palette if final_size == image.size else None, stream=True)
 
-        return get_image_response(for_each_frame(image, parse), transparency=255)
+        return get_image_response(frames, transparency=255)
@@ -1,15 +1,16 @@
 import numbers
-from functools import reduce
 from math import ceil, log10, floor
 from typing import Optional, List, Dict
 
-from PIL import Image, ImageDraw, ImageOps, ImageFont
+import numpy as np
 
 from handlers.handler import Handler, GraphHandler
 from utility.colour import as_rgb_tuple
 from utility.error import ErrorCode
-from utility.image import get_image_response, get_font_asset
+from utility.image import get_font_asset
 from utility.response import BadRequest
+from utility.scene import Scene, get_scene_response
+from utility.series import get_largest_triangle_indexes, get_descending_ranks
 
 
 class LineGraphHandler(GraphHandler):
@@ -31,7 +32,8 @@ class LineGraphHandler(GraphHandler):
             (["value_suffix"], Optional[str]),
             (["sort_colours"], Optional[bool]),
             (["steps"], Optional[int]),
-            (["fill"], Optional[bool])
+            (["fill"], Optional[bool]),
+            (["downsample"], Optional[bool])
         ]
 
         self.require_authorization = False
@@ -59,6 +61,9 @@ class LineGraphHandler(GraphHandler):
             if not isinstance(values, list):
                 raise BadRequest(f"data.{index}.value is not a list", ErrorCode.INVALID_FIELD_VALUE)
 
+            if not all(value is None or isinstance(value, (int, float)) for value in values):
+                raise BadRequest(f"data.{index}.value has to be a list of numbers", ErrorCode.INVALID_FIELD_VALUE)
+
             max_length = max(max_length, len(values))
 
         x_header = self.query("x_header") or self.body("x_header")
@@ -72,6 +77,7 @@ class LineGraphHandler(GraphHandler):
         value_suffix = self.body("value_suffix", str, "")
         sort_colours = self.body("sort_colours", bool, True)
         fill = self.body("fill", bool, True)
+        downsample = self.body("downsample", bool, False)
         y_points = self.body("steps", int, 7) + 1
         if y_points < 2:
             raise BadRequest(f"steps needs to be a value more than 0", ErrorCode.INVALID_FIELD_VALUE)
@@ -84,16 +90,14 @@ class LineGraphHandler(GraphHandler):
         default_point_length = int(excess / 7.5)
         graph_width, graph_height = width + excess, height + excess
 
-        image = Image.new("RGBA", (width + excess * 2, height + excess * 2), (0, 0, 0, 0))
-
-        draw = ImageDraw.Draw(image)
-        draw.rectangle((excess, excess, graph_width, graph_height), fill=self.surface_colour_alpha(10), outline=self.accent_colour_alpha(255), width=1 * multiplier)
+        scene = Scene((width + excess * 2, height + excess * 2), render_mode=self.render_mode)
+        scene.rectangle((excess, excess, graph_width, graph_height), fill=self.surface_colour_alpha(10), outline=self.accent_colour_alpha(255), width=1 * multiplier)
 
         axis_font = get_font_asset("roboto/RobotoMono-Bold.ttf", 10 * multiplier)
 
         variable = min_value is None or max_value is None
         if variable:
-            values = [x for x in reduce(lambda a, b: a + b["value"], data, []) if x is not None]
+            values = [x for point in data for x in point["value"] if x is not None]
             max_value, min_value = max(values), min(values)
             difference = abs(max_value - min_value)
             if difference == 0:
@@ -117,24 +121,29 @@ class LineGraphHandler(GraphHandler):
 
         x_change = width if len(data) == 1 else width / (len(data) - 1)
 
-        max_text_length = max([axis_font.getsize(x["name"])[0] for x in data])
+        # the axis font is monospaced, names are only as wide as how many characters they have and how far the glyphs at
+        # their ends reach out, so one of the longest names with each pair of ends is enough to measure
+        longest = max(len(point["name"]) for point in data)
+        ends = {(point["name"][:1], point["name"][-1:]): point["name"] for point in data if len(point["name"]) == longest}
+        max_text_length = max(axis_font.getsize(name)[0] for name in ends.values())
         points_per_text = ceil(max_text_length / (width / len(data) * 0.8))
 
-        range_length = range(max_length)
-        if sort_colours:
-            positions = [[] for _ in range(max_length)]
-            for point in data:
-                values = point.get("value")
-                sorted_values = sorted(values, reverse=True)
+        # downsampled graphs keep about a point for every pixel across. ticks closer than a few pixels only blur into a
+        # bar so they're cut down too, the named ones stay on ticks that are drawn
+        tick_step = ceil(len(data) * 4 / actual_width) if downsample else 1
+        points_per_text = ceil(points_per_text / tick_step) * tick_step
 
-                for i in range_length:
-                    value = values[i]
-                    if value is None:
-                        continue
+        series = [[point["value"][i] if i < len(point["value"]) else None for point in data] for i in range(max_length)]
 
-                    positions[i].append(sorted_values.index(value))
+        range_length = range(max_length)
+        if sort_colours:
+            table = np.array([[np.nan if value is None else value for value in values] for values in series], dtype=np.float64).T
+            ranks = get_descending_ranks(table)
 
-            mean = [sum(x) / len(x) for x in positions]
+            valid = ~np.isnan(table)
+            counts = valid.sum(axis=0)
+            sums = np.where(valid, ranks, 0).sum(axis=0)
+            mean = np.divide(sums, counts, out=np.zeros(max_length), where=counts > 0).tolist()
             colours = sorted(colours, key=lambda c: (0.2126 * ((c >> 16) & 0xFF) + 0.7152 * ((c >> 8) & 0xFF) + 0.0722 * (c & 0xFF)))
 
             def check_index(d, x):
@@ -144,55 +153,54 @@ class LineGraphHandler(GraphHandler):
             colours = sorted(colours, key=lambda x: check_index(colours, x))
             range_length = sorted(range_length, key=lambda x: check_index(range_length, x))
 
-        for i in range_length:
-            polygon_image = Image.new("RGBA", image.size, 0)
-            polygon_draw = ImageDraw.Draw(polygon_image)
-
-            polygon = [(excess, height + excess)]
-            for index, point in enumerate(data):
-                x = x_change * index + excess
-                if i == range_length[0]:
-                    name = point.get("name")
-                    extra = (x_change * 0.5 if len(data) == 1 else 0)
+        for index in range(0, len(data), tick_step):
+            x = x_change * index + excess
+            name = data[index]["name"]
+            extra = (x_change * 0.5 if len(data) == 1 else 0)
 
-                    point_length = default_point_length
-                    if index % points_per_text == 0:
-                        font_width, _ = axis_font.getsize(name)
-                        draw.text((x + extra - font_width / 2, graph_height + (excess * 0.2)), name, font=axis_font, fill=self.accent_colour_alpha(255))
-                    else:
-                        point_length /= 2
+            point_length = default_point_length
+            if index % points_per_text == 0:
+                font_width, _ = axis_font.getsize(name)
+                scene.text((x + extra - font_width / 2, graph_height + (excess * 0.2)), name, font=axis_font, fill=self.accent_colour_alpha(255))
+            else:
+                point_length /= 2
 
-                    draw.line((x + extra, graph_height, x + extra, graph_height + point_length), fill=self.accent_colour_alpha(255),
-                              width=1 * multiplier)
+            scene.line((x + extra, graph_height, x + extra, graph_height + point_length), fill=self.accent_colour_alpha(255),
+                       width=1 * multiplier)
 
-                values = point.get("value")
-                value = values[i]
-                if value is None:
-                    polygon.append((x - x_change, graph_height))
-                    break
+        for i in range_length:
+            values = series[i]
+            # a series stops at its first missing value
+            end = values.index(None) if None in values else len(values)
+            indexes = get_largest_triangle_indexes(values[:end], actual_width) if downsample else range(end)
 
-                percent = 0.5 if difference_graph == 0 else max(0, min(1, (max_value - value) / difference_graph))
+            polygon = [(excess, height + excess)]
+            for index in indexes:
+                x = x_change * index + excess
+                percent = 0.5 if difference_graph == 0 else max(0, min(1, (max_value - values[index]) / difference_graph))
 
                 y = percent * height + excess
                 polygon.append((x, y))
                 if len(data) == 1:
                     polygon.append((x_change + excess, y))
+
+            if end < len(values):
+                polygon.append((x_change * end + excess - x_change, graph_height))
             else:
                 polygon.append((graph_width, graph_height))
 
             colour = colours[i] if len(colours) > i else None
             colour = (255, 0, 0) if colour is None else as_rgb_tuple(colour)
 
+            layer = scene.layer()
             if fill:
-                polygon_draw.polygon(polygon, fill=colour + (100,))
+                layer.polygon(polygon, fill=colour + (100,))
 
             line_points = polygon[1:-1]
-            for p in range(len(line_points) - 1):
-                polygon_draw.line((line_points[p], line_points[p + 1]), fill=colour + (255,), width=2 * multiplier)
+            if len(line_points) > 1:
+                layer.line(line_points, fill=colour + (255,), width=2 * multiplier)
 
-            image = Image.alpha_composite(image, polygon_image)
-
-        draw = ImageDraw.Draw(image)
+            scene.alpha_composite(layer)
 
         legend_width = excess
         rectangle_size = 10 * multiplier
@@ -207,12 +215,12 @@ class LineGraphHandler(GraphHandler):
             colour = (255, 0, 0) if colour is None else as_rgb_tuple(colour)
 
             excess_center = graph_height + excess - (excess / 3)
-            draw.rectangle((legend_width, excess_center - (rectangle_size / 2), legend_width + rectangle_size,
-                            excess_center + (rectangle_size / 2)), fill=colour + (255,))
+            scene.rectangle((legend_width, excess_center - (rectangle_size / 2), legend_width + rectangle_size,
+                             excess_center + (rectangle_size / 2)), fill=colour + (255,))
 
             legend_width += rectangle_size + 5 * multiplier
 
-            draw.text((legend_width, excess_center - rectangle_size / 1.4), name, font=axis_font, fill=self.accent_colour_alpha(255))
+            scene.text((legend_width, excess_center - rectangle_size / 1.4), name, font=axis_font, fill=self.accent_colour_alpha(255))
 
             legend_width += axis_font.getsize(name)[0] + 15 * multiplier
 
@@ -221,14 +229,14 @@ class LineGraphHandler(GraphHandler):
 
         for index in range(y_points):
             y = (height / (y_points - 1) * index) + excess
-            draw.line((excess - default_point_length, y, graph_width, y), fill=self.accent_colour_alpha(255), width=1 * multiplier)
+            scene.line((excess - default_point_length, y, graph_width, y), fill=self.accent_colour_alpha(255), width=1 * multiplier)
 
             value = max_value - (index * change)
 
             text = f"{value_prefix}{value:.{digits}f}{value_suffix}"
             font_width, font_height = axis_font.getsize(text)
 
-            draw.text((excess - (excess / 5) - font_width, y - font_height / 1.8), text, font=axis_font, fill=self.accent_colour_alpha(255))
+            scene.text((excess - (excess / 5) - font_width, y - font_height / 1.8), text, font=axis_font, fill=self.accent_colour_alpha(255))
 
         for key_point in key_points:
             value = key_point.get("value")
@@ -243,29 +251,18 @@ class LineGraphHandler(GraphHandler):
 
             colour = key_point.get("colour")
 
-            draw.line((excess, y, graph_width, y), fill=(as_rgb_tuple(colour) if colour is not None else (255, 0, 0)) + (255,), width=2 * multiplier)
+            scene.line((excess, y, graph_width, y), fill=(as_rgb_tuple(colour) if colour is not None else (255, 0, 0)) + (255,), width=2 * multiplier)
 
-        draw.rectangle((excess, excess, graph_width, graph_height), outline=self.accent_colour_alpha(255))
+        scene.rectangle((excess, excess, graph_width, graph_height), outline=self.accent_colour_alpha(255))
 
         if x_header and y_header:
             font = get_font_asset("roboto/RobotoMono-Regular.ttf", excess - (25 * multiplier))
             x_font_width, x_font_height = font.getsize(x_header)
             y_font_width, y_font_height = font.getsize(y_header)
 
-            font_image = Image.new("RGBA", (y_font_width, y_font_height), (0, 0, 0, 0))
-            font_draw = ImageDraw.Draw(font_image)
-            font_draw.text((0, 0), y_header, font=font, fill=self.accent_colour_alpha(255))
-
-            font_image = font_image.rotate(270, expand=1)
-
-            image.paste(font_image,
-                        (int(width + excess * 2 - y_font_height), int(((height + excess * 2) - y_font_width) / 2)))
-            draw.text((((width + excess * 2) - x_font_width) / 2, excess - (excess / 7) - x_font_height), x_header,
-                      font=font, fill=self.accent_colour_alpha(255))
-
-        image = image.resize((actual_width, actual_height), Image.LANCZOS)
-
-        final_image = Image.new("RGB", (actual_width, actual_height), self.background_colour)
-        final_image.paste(image, (0, 0), image)
+            scene.vertical_text((int(width + excess * 2 - y_font_height), int(((height + excess * 2) - y_font_width) / 2)),
+                                y_header, font=font, fill=self.accent_colour_alpha(255))
+            scene.text((((width + excess * 2) - x_font_width) / 2, excess - (excess / 7) - x_font_height), x_header,
+                       font=font, fill=self.accent_colour_alpha(255))
 
-        return get_image_response([final_image])
+        return get_scene_response(scene, (actual_width, actual_height), self.background_colour)
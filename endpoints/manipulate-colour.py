@@ -1,12 +1,9 @@
 import colorsys
-from io import BytesIO
-from typing import Optional
 
-from PIL import Image
-
-from handlers.handler import Handler, SingleImageHandler
+from handlers.handler import SingleImageHandler
 from utility.colour import as_rgb_tuple
-from utility.image import get_image_response, for_each_frame, get_image
+from utility.image import get_image_response, for_each_frame
+from utility.kernel import apply_kernel, apply_palette_kernel, replace_hue
 
 
 class ManipulateColourHandler(SingleImageHandler):
@@ -22,18 +19,13 @@ class ManipulateColourHandler(SingleImageHandler):
 
         h, s, v = colorsys.rgb_to_hsv(colour[0] / 255, colour[1] / 255, colour[2] / 255)
 
-        def parse(frame):
-            frame = frame.convert("RGBA")
-            pixels = frame.load()
-            for x in range(frame.size[0]):
-                for y in range(frame.size[1]):
-                    r, g, b, a = pixels[x, y]
-
-                    ch, cs, cv = colorsys.rgb_to_hsv(r / 255, b / 255, g / 255)
-                    nr, ng, nb = colorsys.hsv_to_rgb(h, cs, cv)
+        def kernel(pixels):
+            return replace_hue(pixels, h)
 
-                    pixels[x, y] = int(nr * 255), int(ng * 255), int(nb * 255), a
+        def parse(frame):
+            return apply_kernel(frame, kernel)
 
-            return frame
+        def parse_palette(frame):
+            return apply_palette_kernel(frame, kernel)
 
-        return get_image_response(for_each_frame(image, parse), transparency=255)
+        return get_image_response(for_each_frame(image, parse, parse_palette, stream=True), transparency=255)
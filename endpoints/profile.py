@@ -150,5 +150,8 @@ class ProfileHandler(SingleImageHandler):
     def image_queries(self):
         return [("avatar", True, True)]
 
+    def target_size(self):
+        return 208, 208
+
     def modify_images(self, images):
         return create_avatar(images[0].convert("RGBA").resize((208, 208), Image.ANTIALIAS))
@@ -3,13 +3,12 @@ import math
 from math import cos, sin
 from typing import Dict, List, Optional
 
-from PIL import ImageDraw, Image
-
 from handlers.handler import Handler, GraphHandler
 from utility.colour import as_rgb_tuple
 from utility.error import ErrorCode
-from utility.image import get_image_response, get_image_asset, get_image, get_font_asset
+from utility.image import get_images_or_assets, get_font_asset
 from utility.response import BadRequest
+from utility.scene import Scene, get_scene_response
 
 
 class RadarChartHandler(GraphHandler):
@@ -62,8 +61,10 @@ class RadarChartHandler(GraphHandler):
 
         icon_size = int(width / 10), int(height / 10)
 
-        image = Image.new("RGBA", (width, height), (0, 0, 0, 0))
-        draw = ImageDraw.Draw(image)
+        icon_indexes = [index for index, point in enumerate(data) if point.get("icon") is not None]
+        icons = dict(zip(icon_indexes, get_images_or_assets([(data[index].get("icon"), f"data.{index}.icon", "field") for index in icon_indexes])))
+
+        scene = Scene((width, height), render_mode=self.render_mode)
         font = get_font_asset("roboto/RobotoMono-Bold.ttf", 15 * multiplier)
 
         percent = 1 / max_value
@@ -79,12 +80,12 @@ class RadarChartHandler(GraphHandler):
 
             polygons.append(polygon_points)
 
-        draw.polygon(polygons[-1], fill=self.surface_colour_alpha(10))
+        scene.polygon(polygons[-1], fill=self.surface_colour_alpha(10))
 
         for i in range(sides):
             for polygon_points in polygons:
-                draw.line([polygon_points[i], polygon_points[(i + 1) % sides]], fill=self.accent_colour_alpha(255),
-                          width=1 * multiplier)
+                scene.line([polygon_points[i], polygon_points[(i + 1) % sides]], fill=self.accent_colour_alpha(255),
+                           width=1 * multiplier)
 
         range_length = range(max_length)
         if sort_colours:
@@ -107,9 +108,6 @@ class RadarChartHandler(GraphHandler):
             range_length = sorted(range_length, key=lambda x: check_index(range_length, x))
 
         for i in range_length:
-            polygon_image = Image.new("RGBA", image.size, 0)
-            polygon_draw = ImageDraw.Draw(polygon_image)
-
             polygon, lines = [], []
             for index, point in enumerate(data):
                 values = point.get("values")
@@ -129,35 +127,29 @@ class RadarChartHandler(GraphHandler):
                 extra = 4 if icon_url is not None else 2 if text is not None else 1
 
                 line = (center + radius * cos_x + (cos_x * offset * extra), center + radius * sin_y + (sin_y * offset * extra), center + (cos_x * offset), center + (sin_y * offset))
-                draw.line(line, fill=self.accent_colour_alpha(255), width=1 * multiplier)
+                scene.line(line, fill=self.accent_colour_alpha(255), width=1 * multiplier)
 
                 if icon_url is not None:
-                    try:
-                        icon = get_image_asset(icon_url)
-                    except:
-                        icon = get_image(icon_url, f"data.{index}.icon", "field")
-
-                    icon = icon.resize(icon_size)
+                    icon = icons[index].resize(icon_size)
 
-                    image.paste(icon, (int(center + radius * cos_x - (icon_size[0] / 2) + (cos_x * icon_size[0])),
+                    scene.paste(icon, (int(center + radius * cos_x - (icon_size[0] / 2) + (cos_x * icon_size[0])),
                                        int(center + radius * sin_y - (icon_size[1] / 2) + (sin_y * icon_size[1]))), icon)
                 elif text is not None:
                     text_size = font.getsize(text)
 
-                    draw.text((center + radius * cos_x + (cos_x * offset * 2.2) - (text_size[0] / 2) + (cos_x * text_size[0] * 0.7), center + radius * sin_y + (sin_y * offset * 2.2) - (text_size[1] / 2) + (sin_y * text_size[1] * 0.7)), text, font=font, fill=self.accent_colour_alpha(255))
+                    scene.text((center + radius * cos_x + (cos_x * offset * 2.2) - (text_size[0] / 2) + (cos_x * text_size[0] * 0.7), center + radius * sin_y + (sin_y * offset * 2.2) - (text_size[1] / 2) + (sin_y * text_size[1] * 0.7)), text, font=font, fill=self.accent_colour_alpha(255))
 
             colour = colours[i] if len(colours) > i else None
             colour = (255, 0, 0) if colour is None else as_rgb_tuple(colour)
 
+            layer = scene.layer()
             if fill:
-                polygon_draw.polygon(polygon, fill=colour + (100,))
+                layer.polygon(polygon, fill=colour + (100,))
 
             for p in range(len(polygon)):
-                polygon_draw.line((polygon[p], polygon[(p + 1) % len(polygon)]), fill=colour + (255,), width=2 * multiplier)
+                layer.line((polygon[p], polygon[(p + 1) % len(polygon)]), fill=colour + (255,), width=2 * multiplier)
 
-            image = Image.alpha_composite(image, polygon_image)
-
-        draw = ImageDraw.Draw(image)
+            scene.alpha_composite(layer)
 
         legend_width = 15 * multiplier
         rectangle_size = 15 * multiplier
@@ -169,15 +161,10 @@ class RadarChartHandler(GraphHandler):
             colour = colours[i] if len(colours) > i else None
             colour = (255, 0, 0) if colour is None else as_rgb_tuple(colour)
 
-            draw.rectangle((legend_width, height - rectangle_size * 2, legend_width + rectangle_size, height - rectangle_size), fill=colour + (255,))
+            scene.rectangle((legend_width, height - rectangle_size * 2, legend_width + rectangle_size, height - rectangle_size), fill=colour + (255,))
             legend_width += rectangle_size + 5 * multiplier
 
-            draw.text((legend_width, height - rectangle_size * 2.2), name, font=font, fill=self.accent_colour_alpha(255))
+            scene.text((legend_width, height - rectangle_size * 2.2), name, font=font, fill=self.accent_colour_alpha(255))
             legend_width += font.getsize(name)[0] + rectangle_size * 1.2
 
-        image = image.resize((actual_width, actual_height), Image.LANCZOS)
-
-        final_image = Image.new("RGB", (actual_width, actual_height), self.background_colour)
-        final_image.paste(image, (0, 0), image)
-
-        return get_image_response([final_image])
+        return get_scene_response(scene, (actual_width, actual_height), self.background_colour)
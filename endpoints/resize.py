@@ -1,8 +1,11 @@
-from typing import Optional
+from functools import partial
+from typing import Optional, Tuple, List
+
+from PIL import Image
 
 from handlers.handler import SingleImageHandler
 from utility.error import ErrorCode
-from utility.image import get_image_response, for_each_frame
+from utility.image import get_image_response, for_each_frame, ImageInfo
 from utility.response import BadRequest
 
 
@@ -13,21 +16,21 @@ class ResizeHandler(SingleImageHandler):
 
         self.queries = [(["width", "w"], Optional[float]), (["height", "h"], Optional[float])]
 
-    def on_request(self, image):
+    def get_size(self, image_size: Tuple[int, int]) -> Tuple[int, int]:
         width = self.query("width", float) or self.query("w", float)
         height = self.query("height", float) or self.query("h", float)
 
         if not width and not height:
             raise BadRequest("width and height query not given", ErrorCode.QUERY_MISSING)
 
-        width = width if width else image.size[0]
-        height = height if height else image.size[1]
+        width = width if width else image_size[0]
+        height = height if height else image_size[1]
 
         if width <= 1:
-            width = round(width * image.size[0])
+            width = round(width * image_size[0])
 
         if height <= 1:
-            height = round(height * image.size[1])
+            height = round(height * image_size[1])
 
         if width < 1 or height < 1:
             raise BadRequest("width or height is a negative number", ErrorCode.INVALID_QUERY_VALUE)
@@ -35,6 +38,16 @@ class ResizeHandler(SingleImageHandler):
         if width > 5000 or height > 5000:
             raise BadRequest("Neither width or height can be more than 5000 pixels in size", ErrorCode.INVALID_QUERY_VALUE)
 
-        frames = for_each_frame(image, lambda frame: frame.resize((int(width), int(height))))
+        return int(width), int(height)
+
+    def estimate_cost(self, images: List[ImageInfo]) -> int:
+        width, height = self.get_size(images[0].size)
+
+        return super().estimate_cost(images) + width * height * images[0].frames
+
+    def on_request(self, image):
+        size = self.get_size(image.size)
+
+        frames = for_each_frame(image, partial(Image.Image.resize, size=size), parallel=True)
 
         return get_image_response(frames)
@@ -14,7 +14,7 @@ class ScrollHandler(Handler):
     def on_request(self):
         text = self.query("text")
 
-        background = get_image_asset("scroll-meme.png")
+        background = get_image_asset("scroll-meme.png").copy()
         font = get_font_asset("arialuni.ttf", 20)
 
         draw = ImageDraw.Draw(background)
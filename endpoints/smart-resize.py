@@ -1,3 +1,5 @@
+from functools import partial
+
 from handlers.handler import SingleImageHandler
 from utility.error import ErrorCode
 from utility.image import for_each_frame, resize_to_ratio, get_image_response
@@ -20,4 +22,4 @@ class SmartResize(SingleImageHandler):
         if size[0] > 5000 or size[1] > 5000:
             raise BadRequest("Neither width or height can be more than 5000 pixels in size", ErrorCode.INVALID_QUERY_VALUE)
 
-        return get_image_response(for_each_frame(image, lambda frame: resize_to_ratio(frame, size)))
+        return get_image_response(for_each_frame(image, partial(resize_to_ratio, size=size), parallel=True))
@@ -1,3 +1,4 @@
+from functools import partial
 from typing import Optional
 
 from PIL import Image, ImageDraw
@@ -6,6 +7,22 @@ from handlers.handler import SingleImageHandler
 from utility.image import create_avatar, get_image_response, get_image_asset, for_each_frame
 
 
+def parse(frame, status):
+    status_icon = get_image_asset(f"{status}.png")
+
+    frame = create_avatar(frame.convert("RGBA").resize((240, 240)))
+
+    draw = ImageDraw.Draw(frame)
+
+    draw.ellipse((160, 160, 240, 240), fill=255)
+
+    copy = Image.new("RGBA", (240, 240), (255, 255, 255, 0))
+    copy.paste(frame, (0, 0), frame)
+    copy.paste(status_icon, (175, 175), status_icon)
+
+    return copy
+
+
 class StatusHandler(SingleImageHandler):
 
     def __init__(self, app):
@@ -18,21 +35,10 @@ class StatusHandler(SingleImageHandler):
         status = status.lower()
         status = "offline" if status == "invisible" else "dnd" if status == "do not disturb" else status
 
-        status_icon = get_image_asset(f"{status}.png")
-
-        blank = Image.new("RGBA", (240, 240), (255, 255, 255, 0))
-
-        def parse(frame):
-            frame = create_avatar(frame.convert("RGBA").resize((240, 240)))
-
-            draw = ImageDraw.Draw(frame)
-
-            draw.ellipse((160, 160, 240, 240), fill=255)
-
-            copy = blank.copy()
-            copy.paste(frame, (0, 0), frame)
-            copy.paste(status_icon, (175, 175), status_icon)
+        # checked here so a missing icon fails the request before any frame is drawn
+        get_image_asset(f"{status}.png")
 
-            return copy
+        return get_image_response(for_each_frame(image, partial(parse, status=status), parallel=True))
 
-        return get_image_response(for_each_frame(image, parse))
+    def target_size(self):
+        return 240, 240
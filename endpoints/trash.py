@@ -1,22 +1,27 @@
+from functools import partial
+
 from PIL import ImageFilter
 
 from handlers.handler import SingleImageHandler
 from utility.image import get_image_asset, get_image_response, for_each_frame
 
 
-class TrashHandler(SingleImageHandler):
+def parse(frame, filter):
+    # the asset is looked up where the frame is drawn, the pool's processes have their own
+    frame = frame.convert("RGBA").resize((193, 192)).filter(filter)
 
-    def on_request(self, image):
-        background = get_image_asset("trash-meme.png")
+    copy = get_image_asset("trash-meme.png").copy()
+    copy.paste(frame, (192, 0), frame)
 
-        filter = ImageFilter.GaussianBlur(10)
+    return copy
 
-        def parse(frame):
-            frame = frame.convert("RGBA").resize((193, 192)).filter(filter)
 
-            copy = background.copy()
-            copy.paste(frame, (192, 0), frame)
+class TrashHandler(SingleImageHandler):
+
+    def on_request(self, image):
+        filter = ImageFilter.GaussianBlur(10)
 
-            return copy
+        return get_image_response(for_each_frame(image, partial(parse, filter=filter), parallel=True), transparency=255)
 
-        return get_image_response(for_each_frame(image, parse), transparency=255)
+    def target_size(self):
+        return 193, 192
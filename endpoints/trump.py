@@ -1,7 +1,8 @@
 from PIL import ImageDraw
 
 from handlers.handler import Handler
-from utility.image import get_font_asset, get_image_asset, get_image_response, get_text_array
+from utility.image import get_font_asset, get_image_asset, get_image_response, get_text_array, \
+    get_text_width
 
 
 class TrumpTweetHandler(Handler):
@@ -14,7 +15,7 @@ class TrumpTweetHandler(Handler):
     def on_request(self):
         text = self.query("text")
 
-        background = get_image_asset("trump-tweet-meme.png")
+        background = get_image_asset("trump-tweet-meme.png").copy()
         font = get_font_asset("segoeuireg.ttf", 25)
 
         draw = ImageDraw.Draw(background)
@@ -30,7 +31,7 @@ class TrumpTweetHandler(Handler):
                 word += " "
                 colour = (0, 132, 180) if word.startswith("#") or word.startswith("@") else (0, 0, 0)
                 draw.text((width, height), word, colour, font)
-                width += font.getsize(word)[0]
+                width += get_text_width(font, word)
 
             height += 30
 
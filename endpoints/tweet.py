@@ -4,7 +4,8 @@ from typing import List, Any
 from PIL import ImageDraw, Image
 
 from handlers.handler import SingleImageHandler
-from utility.image import get_image, get_font_asset, get_image_asset, get_text_array, get_image_response, create_avatar
+from utility.image import get_images, get_font_asset, get_image_asset, get_text_array, get_text_width, \
+    get_image_response, create_avatar, reduce_image
 
 
 class TweetHandler(SingleImageHandler):
@@ -27,7 +28,9 @@ class TweetHandler(SingleImageHandler):
         text = self.body("text")
         likes = f"{self.body('likes', int):,}"
         retweets = f"{self.body('retweets', int):,}"
-        like_images = [create_avatar(get_image(url, f"urls.{i}", "field").convert("RGBA").resize((36, 36))) for i, url in enumerate(self.body("urls", list))]
+        like_urls = [(url, f"urls.{i}", "field") for i, url in enumerate(self.body("urls", list))]
+        like_images = [create_avatar(reduce_image(image, (36, 36)).convert("RGBA").resize((36, 36)))
+                       for image in get_images(like_urls)]
         name = self.body("name")
         display_name = self.body("display_name")
 
@@ -36,7 +39,7 @@ class TweetHandler(SingleImageHandler):
         likes_font = get_font_asset("gotham/GothamBold.ttf", 21)
         text_font = get_font_asset("segoeuireg.ttf", 25)
 
-        background = get_image_asset("tweet.png")
+        background = get_image_asset("tweet.png").copy()
         draw = ImageDraw.Draw(background)
 
         lines = get_text_array(text, text_font, 833)[:4]
@@ -50,7 +53,7 @@ class TweetHandler(SingleImageHandler):
                 word += " "
                 colour = (0, 132, 180) if word.startswith("#") or word.startswith("@") else (0, 0, 0)
                 draw.text((width, height), word, colour, text_font)
-                width += text_font.getsize(word)[0]
+                width += get_text_width(text_font, word)
 
             height += 30
 
@@ -79,5 +82,11 @@ class TweetHandler(SingleImageHandler):
     def image_queries(self):
         return [("avatar", True, False)]
 
+    def cache_bucket(self):
+        return datetime.utcnow().strftime("%Y-%m-%d %H:%M")
+
+    def target_size(self):
+        return 72, 72
+
     def modify_images(self, images: List[type(Image)]) -> Any:
         return create_avatar(images[0].convert("RGBA").resize((72, 72)))
@@ -19,4 +19,7 @@ class VrHandler(SingleImageHandler):
 
             return copy
 
-        return get_image_response(for_each_frame(image, parse), transparency=255)
+        return get_image_response(for_each_frame(image, parse, stream=True), transparency=255)
+
+    def target_size(self):
+        return 225, 135
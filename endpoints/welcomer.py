@@ -83,5 +83,8 @@ class WelcomerHandler(SingleImageHandler):
     def image_queries(self):
         return [("avatar", False, True)]
 
+    def target_size(self):
+        return 300, 300
+
     def modify_images(self, images: List[type(Image)]) -> Any:
         return create_avatar(images[0].convert("RGBA").resize((300, 300)))
@@ -11,7 +11,7 @@ class WhoWouldWinHandler(MultipleImageHandler):
     def on_request(self, images: List[type(Image)]):
         first_image, second_image = images
 
-        background = get_image_asset("www.png")
+        background = get_image_asset("www.png").copy()
 
         background.paste(first_image, (30, 180), first_image)
         background.paste(second_image, (510, 180), second_image)
@@ -21,5 +21,8 @@ class WhoWouldWinHandler(MultipleImageHandler):
     def image_queries(self):
         return [("first_image", False, True), ("second_image", False, True)]
 
+    def target_size(self):
+        return 400, 400
+
     def modify_images(self, images: List[type(Image)]) -> Any:
         return [image.convert("RGBA").resize((400, 400)) for image in images]
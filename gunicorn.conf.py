@@ -0,0 +1,27 @@
+import multiprocessing
+import os
+
+# gunicorn main:app
+bind = os.environ.get("BIND", "0.0.0.0:8443")
+workers = int(os.environ.get("WORKERS", multiprocessing.cpu_count()))
+# threads don't add cpu throughput under the gil, cpu only load is the same with 1 or 4. they let a worker keep
+# serving while others wait on remote images, which can take up to the fetch deadline. set THREADS=1 when images are
+# always sent in the body
+threads = int(os.environ.get("THREADS", 4))
+worker_class = "gthread"
+timeout = int(os.environ.get("TIMEOUT", 60))
+
+# fonts and image assets are loaded once in the master and shared with the forked workers, endpoint modules are
+# imported on their first request unless PRELOAD_ENDPOINTS=1
+preload_app = True
+
+
+def post_fork(server, worker):
+    # the master never serves requests, so the caches, the admission budget and their locks are empty and free when it
+    # forks. what does hold sockets, threads or processes is made again in each worker
+    from utility.fetch import reset_session
+    from utility.image import reset_fetch_executor, reset_frame_pool
+
+    reset_session()
+    reset_fetch_executor()
+    reset_frame_pool()
@@ -1,16 +1,25 @@
 import colorsys
-from functools import wraps
+from functools import wraps, partial
 from io import BytesIO
 from typing import Any, Type, List, Tuple, Optional, Callable
 
 from PIL import Image, UnidentifiedImageError
-from flask import request
+from flask import request, Response, g, make_response
 
 from utility.colour import as_rgb_tuple, as_rgb, Colour
 from utility.config import config
 from utility.error import ErrorCode
-from utility.image import get_image, get_image_response, for_each_frame
+from utility.admission import admission, REQUEST_BASE_COST
+from utility.cache import response_cache, get_response_key
+from utility.image import get_image_bytes, get_images_bytes, open_image, get_image_response, for_each_frame, \
+    get_image_info, ImageInfo, reduce_image
+from utility.raster import SUPERSAMPLE, ANALYTIC, RENDER_MODES
 from utility.response import BadRequest, Unauthorized, MethodNotAllowed
+from utility.scene import is_svg_requested
+
+
+def filter_frame(frame: Image, filter: Any) -> Image:
+    return frame.convert("RGBA").filter(filter)
 
 
 def check_names(t, names, queries, field):
@@ -40,7 +49,7 @@ def check_authorization(f):
         auth = config.get("auth")
         for key in auth:
             if auth[key] == authorization:
-                self.authorization_type = key
+                g.authorization_type = key
                 return f(self)
 
         raise Unauthorized("Invalid authorization header")
@@ -120,7 +129,6 @@ class Handler:
         self.methods = ["GET"]
         self.app = app
         self.require_authorization = True
-        self.authorization_type = None
         self.aliases = []
         self.queries = []
         self.fields = []
@@ -130,11 +138,68 @@ class Handler:
     @check_fields
     @check_queries
     def __call__(self):
-        return self.on_request()
+        return self.cached_response(self.on_request, cost=self.estimate_cost([]))
+
+    # a single handler serves every request, anything set while handling one lives on flask.g so that concurrent
+    # requests can't see each other's state
+    @property
+    def authorization_type(self) -> Optional[str]:
+        return g.get("authorization_type")
 
     def on_request(self, *args):
         pass
 
+    def cache_bucket(self) -> Optional[str]:
+        # outputs that change over time return which period they belong to, None stops them being cached
+        return ""
+
+    def estimate_cost(self, images: List[ImageInfo]) -> int:
+        return REQUEST_BASE_COST + sum(image.pixels for image in images)
+
+    def cached_response(self, on_request: Callable[[], Response], sources: List[bytes] = None,
+                        cost: int = REQUEST_BASE_COST) -> Response:
+        bucket = self.cache_bucket()
+        if bucket is None:
+            return self.admitted_response(on_request, cost)
+
+        key = get_response_key(self.name, self.authorization_type, bucket, sources or [])
+
+        # images fetched inside on_request aren't part of the key, a client's copy is only known to be current while
+        # the output it was sent is still cached
+        cached = response_cache.get(key)
+        if cached and key in self.request.if_none_match:
+            response = Response(status=304)
+            response.set_etag(key)
+
+            return response
+
+        if cached:
+            response = cached.as_response()
+        else:
+            response = self.admitted_response(on_request, cost)
+            response_cache.put(key, response)
+
+        if response.status_code == 200:
+            response.set_etag(key)
+
+        return response
+
+    def admitted_response(self, on_request: Callable[[], Response], cost: int) -> Response:
+        admission.acquire(cost)
+        try:
+            response = make_response(on_request())
+        except Exception:
+            admission.release(cost)
+            raise
+
+        # streamed responses are still being produced while they are sent
+        if response.is_streamed and not response.direct_passthrough:
+            response.call_on_close(lambda: admission.release(cost))
+        else:
+            admission.release(cost)
+
+        return response
+
     @check_values(lambda x: x.queries)
     def query(self, query: str, mapping: Callable[[str], Any] = None, default: Any = None) -> Any:
         return self.request.args.get(query, type=mapping, default=default)
@@ -166,20 +231,48 @@ class GraphHandler(Handler):
         self.fields += [
             (["background_colour", "background_color"], Optional[Colour]),
             (["accent_colour"], Optional[Colour]),
-            (["antialias"], Optional[int])
+            (["antialias"], Optional[int]),
+            (["render_mode"], Optional[str])
         ]
 
     @check_authorization
     @check_fields
     @check_queries
     def __call__(self):
-        self.background_colour = as_rgb_tuple(self.body("background_colour", default=0x121212))
-        brightness = int(255 - colorsys.rgb_to_hls(*self.background_colour)[1])
-        self.surface_colour = (255 if brightness > 127 else 0,) * 3
-        self.accent_colour = as_rgb_tuple(self.body("accent_colour", default=as_rgb(self.surface_colour)))
-        self.antialias = min(5, max(1, self.body("antialias", default=3)))
+        g.background_colour = as_rgb_tuple(self.body("background_colour", default=0x121212))
+        brightness = int(255 - colorsys.rgb_to_hls(*g.background_colour)[1])
+        g.surface_colour = (255 if brightness > 127 else 0,) * 3
+        g.accent_colour = as_rgb_tuple(self.body("accent_colour", default=as_rgb(g.surface_colour)))
+        g.render_mode = self.body("render_mode", str, SUPERSAMPLE).lower()
+        if g.render_mode not in RENDER_MODES:
+            raise BadRequest(f"render_mode has to be one of {', '.join(RENDER_MODES)}", ErrorCode.INVALID_FIELD_VALUE)
+
+        # analytic shapes are smooth at the size they're shown at and svg has no size, drawing them any bigger only
+        # costs more
+        drawn_smooth = g.render_mode == ANALYTIC or is_svg_requested()
+        g.antialias = 1 if drawn_smooth else min(5, max(1, self.body("antialias", default=3)))
+
+        return self.cached_response(self.on_request, cost=self.estimate_cost([]))
+
+    @property
+    def background_colour(self) -> Tuple[int, int, int]:
+        return g.background_colour
+
+    @property
+    def surface_colour(self) -> Tuple[int, int, int]:
+        return g.surface_colour
 
-        return self.on_request()
+    @property
+    def accent_colour(self) -> Tuple[int, int, int]:
+        return g.accent_colour
+
+    @property
+    def antialias(self) -> int:
+        return g.antialias
+
+    @property
+    def render_mode(self) -> str:
+        return g.render_mode
 
     def background_colour_alpha(self, alpha: int) -> Tuple[int, int, int, int]:
         return self.background_colour + (alpha,)
@@ -203,14 +296,19 @@ class MultipleImageHandler(Handler):
     @check_fields
     @check_queries
     def __call__(self):
-        images = []
+        queries = []
         for name, body, _ in self.image_queries():
             name_type = "field" if body else "query"
             query = self.body(name) if body else self.query(name)
 
-            images.append(get_image(query, name, name_type))
+            queries.append((query, name, name_type))
+
+        sources = get_images_bytes(queries)
+        images = [open_image(data, name, name_type) for data, (_, name, name_type) in zip(sources, queries)]
+        cost = self.estimate_cost([get_image_info(image, data) for image, data in zip(images, sources)])
 
-        return self.on_request(self.modify_images(images))
+        return self.cached_response(lambda: self.on_request(self.modify_images(self.reduce_images(images))), sources,
+                                    cost)
 
     def on_request(self, images: List[type(Image)]):
         pass
@@ -218,6 +316,13 @@ class MultipleImageHandler(Handler):
     def image_queries(self) -> List[Tuple[str, bool, bool]]:
         pass
 
+    def target_size(self) -> Optional[Tuple[int, int]]:
+        # the size still images are resized to before they're used, they can be decoded smaller when it's known
+        return None
+
+    def reduce_images(self, images: List[type(Image)]) -> List[type(Image)]:
+        return [reduce_image(image, self.target_size()) for image in images]
+
     def modify_images(self, images: List[type(Image)]) -> Any:
         return images
 
@@ -240,7 +345,7 @@ class SingleImageHandler(MultipleImageHandler):
         if query and not body and self.request.method != "GET":
             raise MethodNotAllowed("Use GET when providing the image as a query")
 
-        image = None
+        image, sources = None, []
         if not query and len(self.fields) == 0:
             if self.request.method != "POST":
                 raise MethodNotAllowed("Use POST when providing the image in the body")
@@ -254,12 +359,17 @@ class SingleImageHandler(MultipleImageHandler):
             except UnidentifiedImageError:
                 raise BadRequest("Could not resolve body to an image", ErrorCode.INVALID_IMAGE_BYTES)
         elif query:
-            image = get_image(query, name, name_type)
+            data = get_image_bytes(query, name, name_type)
+            image = open_image(data, name, name_type)
+            sources.append(data)
 
         if not image:
             raise BadRequest("Image not given in query or body", ErrorCode.VALUE_MISSING)
 
-        return self.on_request(self.modify_images([image]))
+        cost = self.estimate_cost([get_image_info(image, data)])
+
+        return self.cached_response(lambda: self.on_request(self.modify_images(self.reduce_images([image]))), sources,
+                                    cost)
 
     def on_request(self, image: Image):
         pass
@@ -276,7 +386,7 @@ class ImageFilterHandler(SingleImageHandler):
     def on_request(self, image):
         filter = self.filter()
 
-        frames = for_each_frame(image, lambda frame: frame.convert("RGBA").filter(filter))
+        frames = for_each_frame(image, partial(filter_frame, filter=filter), parallel=True)
 
         return get_image_response(frames, transparency=255)
 
@@ -0,0 +1,143 @@
+import ast
+import importlib
+import inspect
+import os
+import time
+from threading import Lock
+from typing import List, Optional, Dict, Tuple
+
+from flask import request
+
+from handlers.handler import Handler
+from utility.response import MethodNotAllowed
+
+# every method a handler can use, for a handler whose methods can't be read from its source
+ROUTE_METHODS = ["GET", "POST"]
+HANDLER_PATH = "handlers/handler.py"
+
+
+def get_tree(path: str) -> ast.Module:
+    with open(path) as file:
+        return ast.parse(file.read(), path)
+
+
+def get_assigned_list(tree: ast.AST, attribute: str) -> Optional[List[str]]:
+    # reads self.<attribute> = [...] from source so the route can be registered without importing it
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Assign) or not isinstance(node.value, ast.List):
+            continue
+
+        for target in node.targets:
+            if isinstance(target, ast.Attribute) and target.attr == attribute and isinstance(target.value, ast.Name) \
+                    and target.value.id == "self":
+                return [element.value for element in node.value.elts if isinstance(element, ast.Constant)]
+
+    return None
+
+
+def get_classes(tree: ast.Module) -> Dict[str, Tuple[List[str], Optional[List[str]]]]:
+    # the bases and the methods each class sets itself
+    return {node.name: ([base.id for base in node.bases if isinstance(base, ast.Name)],
+                        get_assigned_list(node, "methods"))
+            for node in tree.body if isinstance(node, ast.ClassDef)}
+
+
+def get_methods(classes: Dict[str, Tuple[List[str], Optional[List[str]]]], name: str) -> Optional[List[str]]:
+    # a handler sets its methods after its base's __init__, so the nearest class that sets them wins
+    while name in classes:
+        bases, methods = classes[name]
+        if methods is not None:
+            return methods
+
+        if not bases:
+            break
+
+        name = bases[0]
+
+    return None
+
+
+class LazyEndpoint:
+
+    def __init__(self, app, name: str, aliases: List[str], methods: List[str]):
+        self.app = app
+        self.name = name
+        self.aliases = aliases
+        # flask reads the route's methods from here, it adds HEAD to GET routes and answers OPTIONS itself
+        self.methods = methods
+        self.handler: Optional[Handler] = None
+        self.import_time = None
+        self.lock = Lock()
+
+    def load(self) -> Handler:
+        if self.handler is not None:
+            return self.handler
+
+        with self.lock:
+            if self.handler is None:
+                path = f"endpoints.{self.name}"
+
+                start = time.perf_counter()
+                module = importlib.import_module(path)
+
+                for _, obj in inspect.getmembers(module, inspect.isclass):
+                    if obj.__module__ == path:
+                        self.handler = obj(self.app)
+                        break
+
+                self.import_time = time.perf_counter() - start
+                self.app.logger.info(f"Imported {path} in {self.import_time * 1000:.1f}ms")
+
+        return self.handler
+
+    def __call__(self):
+        handler = self.load()
+        method = "GET" if request.method == "HEAD" else request.method
+        if method not in handler.methods:
+            raise MethodNotAllowed(f"{request.method} is not allowed on this endpoint", allowed=handler.methods)
+
+        return handler()
+
+
+class EndpointRegistry:
+
+    def __init__(self, app, directory: str = "endpoints"):
+        self.app = app
+        self.directory = directory
+        self.endpoints: List[LazyEndpoint] = []
+
+    def register(self) -> None:
+        start = time.perf_counter()
+        handler_classes = get_classes(get_tree(HANDLER_PATH))
+
+        for file in sorted(os.listdir(self.directory)):
+            if not file.endswith(".py"):
+                continue
+
+            tree = get_tree(os.path.join(self.directory, file))
+            classes = get_classes(tree)
+
+            # the registry builds the first class the module defines by name, the same as inspect.getmembers orders
+            # them
+            methods = get_methods({**handler_classes, **classes}, min(classes)) if classes else None
+
+            endpoint = LazyEndpoint(self.app, file[:-3], get_assigned_list(tree, "aliases") or [],
+                                    methods or ROUTE_METHODS)
+            self.endpoints.append(endpoint)
+
+            self.app.add_url_rule(f"/api/{endpoint.name}", endpoint.name, endpoint)
+            for alias in endpoint.aliases:
+                self.app.add_url_rule(f"/api/{alias}", alias, endpoint)
+
+        self.app.logger.info(f"Registered {len(self.endpoints)} endpoints in "
+                             f"{(time.perf_counter() - start) * 1000:.1f}ms, handlers are imported on their first request")
+
+    def handlers(self) -> List[Handler]:
+        return [endpoint.load() for endpoint in self.endpoints]
+
+    def load_all(self) -> None:
+        self.handlers()
+
+        times = sorted(self.endpoints, key=lambda endpoint: endpoint.import_time, reverse=True)
+        self.app.logger.info("Endpoint import times:\n" + "\n".join(
+            f"  endpoints.{endpoint.name}: {endpoint.import_time * 1000:.1f}ms" for endpoint in times))
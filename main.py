@@ -1,55 +1,26 @@
-import inspect
 import os
-import sys
 import traceback
 
 from flask import Flask, request, Request
 
+from handlers.registry import EndpointRegistry
 from utility.error import ErrorCode
+from utility.image import load_image_assets, load_font_assets
 from utility.response import NotFound, MethodNotAllowed, BadRequest, JsonException, InternalError
 
-app = Flask(__name__)
 
-app.endpoints = []
-
-for file in os.listdir("endpoints"):
-    if ".py" not in file:
-        continue
-
-    file = file[:-3]
-    path = f"endpoints.{file}"
-
-    __import__(path)
-
-    for name, obj in inspect.getmembers(sys.modules[path], inspect.isclass):
-        if obj.__module__ == path:
-            handler = obj(app)
-
-            app.endpoints.append(handler)
-            app.add_url_rule(f"/api/{handler.name}", handler.name, handler)
-
-            for alias in handler.aliases:
-                app.add_url_rule(f"/api/{alias}", alias, handler)
-
-            break
-
-
-@app.errorhandler(JsonException)
-def error_handler(error):
+def json_error_handler(error):
     return error.as_response()
 
 
-@app.errorhandler(404)
 def not_found(error):
     return NotFound("You've reached a dead end, turn around").as_response()
 
 
-@app.errorhandler(405)
 def method_not_allowed(error):
-    return MethodNotAllowed(f"{request.method} is not allowed on this endpoint").as_response()
+    return MethodNotAllowed(f"{request.method} is not allowed on this endpoint", allowed=error.valid_methods).as_response()
 
 
-@app.errorhandler(Exception)
 def error_handler(error):
     traceback.print_exc()
     return InternalError("An unknown error occurred", {"error": str(error)}).as_response()
@@ -61,5 +32,32 @@ def on_json_loading_failed(x, y):
 
 Request.on_json_loading_failed = on_json_loading_failed
 
+
+def create_app(preload_endpoints: bool = None) -> Flask:
+    if preload_endpoints is None:
+        preload_endpoints = os.environ.get("PRELOAD_ENDPOINTS") == "1"
+
+    app = Flask(__name__)
+
+    app.endpoints = EndpointRegistry(app)
+    app.endpoints.register()
+
+    if preload_endpoints:
+        app.endpoints.load_all()
+
+    app.register_error_handler(JsonException, json_error_handler)
+    app.register_error_handler(404, not_found)
+    app.register_error_handler(405, method_not_allowed)
+    app.register_error_handler(Exception, error_handler)
+
+    # loaded at import so a preloading server shares them copy-on-write with every worker it forks
+    load_image_assets()
+    load_font_assets()
+
+    return app
+
+
+app = create_app()
+
 if __name__ == "__main__":
     app.run("0.0.0.0", 8443)
@@ -0,0 +1,78 @@
+import os
+import sys
+import unittest
+from io import BytesIO
+from typing import List
+
+from PIL import Image, ImageSequence
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FRAMES = 4
+COLOURS = 16
+# the first palette entry is fully transparent and the second half transparent, a tRNS table a gif can't hold
+ALPHAS = bytes([0, 128] + [255] * (COLOURS - 2))
+
+
+def get_frames(frame_count: int) -> List[type(Image)]:
+    frames = []
+    for offset in range(frame_count):
+        frame = Image.new("P", (40, 30))
+        frame.putpalette(bytes(channel for i in range(COLOURS) for channel in (i * 16, 255 - i * 16, i * 8)))
+        frame.putdata([(i + offset) % COLOURS for i in range(40 * 30)])
+        frame.info["transparency"] = ALPHAS
+        frames.append(frame)
+
+    return frames
+
+
+def get_png(frames: List[type(Image)]) -> bytes:
+    b = BytesIO()
+    frames[0].save(b, format="png", save_all=len(frames) > 1, append_images=frames[1:])
+
+    return b.getvalue()
+
+
+@unittest.skipUnless(os.path.exists(os.path.join(ROOT, "config.json")), "config.json is needed to import the app")
+class GifTransparencyTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # assets and config are read relative to the repository
+        os.chdir(ROOT)
+        sys.path.insert(0, ROOT)
+
+        import main
+        from utility.config import config
+
+        cls.client = main.app.test_client()
+        cls.headers = {"Authorization": next(iter(config.get("auth").values()))}
+
+    def post(self, path: str, data: bytes) -> bytes:
+        response = self.client.post(path, data=data, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, "image/gif")
+
+        return response.get_data()
+
+    def assert_same_as_rgba(self, path: str, frames: List[type(Image)], frame_count: int):
+        # a gif can't keep the alpha table, so the frames are expected to come out as they would from RGBA ones
+        output = self.post(path, get_png(frames))
+        expected = self.post(path, get_png([frame.convert("RGBA") for frame in frames]))
+
+        output_frames = [frame.convert("RGBA") for frame in ImageSequence.Iterator(Image.open(BytesIO(output)))]
+        expected_frames = [frame.convert("RGBA") for frame in ImageSequence.Iterator(Image.open(BytesIO(expected)))]
+
+        self.assertEqual(len(output_frames), frame_count)
+        for output_frame, expected_frame in zip(output_frames, expected_frames):
+            self.assertEqual(output_frame.tobytes(), expected_frame.tobytes())
+
+    def test_hue_of_alpha_table_png(self):
+        self.assert_same_as_rgba(f"/api/hue?frames={FRAMES}", get_frames(1), FRAMES)
+
+    def test_streamed_alpha_table_png(self):
+        self.assert_same_as_rgba("/api/invert", get_frames(FRAMES), FRAMES)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import sys
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from itertools import product
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ROUNDS = 3
+THREADS = 6
+REQUEST_DELAY = 0.05
+
+DATA = [{"name": "a", "value": [10, 40]}, {"name": "b", "value": [30, 20]}, {"name": "c", "value": [25, 35]}]
+
+# every value GraphHandler keeps on flask.g for the request, a light and a dark background also give different
+# surface colours
+BODIES = [{"data": DATA, "background_colour": background, "accent_colour": accent, "antialias": antialias,
+           "render_mode": render_mode}
+          for background, accent, (antialias, render_mode) in
+          product([0xFFFFFF, 0x121212], [0xFF0000, 0x00FF00], [(1, "supersample"), (2, "supersample"), (1, "analytic")])]
+
+
+@unittest.skipUnless(os.path.exists(os.path.join(ROOT, "config.json")), "config.json is needed to import the app")
+class RequestStateTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # assets and config are read relative to the repository
+        os.chdir(ROOT)
+        sys.path.insert(0, ROOT)
+
+        import main
+        cls.client = main.app.test_client()
+
+        # each request waits between storing its state and drawing with it, so the others always store theirs in
+        # between and any state that isn't the request's own shows up in the output
+        handler = next(endpoint for endpoint in main.app.endpoints.endpoints if endpoint.name == "line-graph").load()
+        on_request = handler.on_request
+
+        def delayed_on_request():
+            time.sleep(REQUEST_DELAY)
+            return on_request()
+
+        handler.on_request = delayed_on_request
+        cls.handler = handler
+
+    @classmethod
+    def tearDownClass(cls):
+        del cls.handler.on_request
+
+    def post(self, index: int, run: str) -> bytes:
+        # the query only makes each request's cache key unique, a cached response would hide output from another one
+        response = self.client.post(f"/api/line-graph?run={run}", json=BODIES[index])
+        self.assertEqual(response.status_code, 200)
+
+        return response.get_data()
+
+    def test_concurrent_graphs_keep_their_own_state(self):
+        expected = [self.post(index, f"expected-{index}") for index in range(len(BODIES))]
+
+        jobs = [(index, f"{round}-{index}") for round in range(ROUNDS) for index in range(len(BODIES))]
+        with ThreadPoolExecutor(THREADS) as executor:
+            outputs = list(executor.map(lambda job: self.post(*job), jobs))
+
+        for (index, run), output in zip(jobs, outputs):
+            self.assertEqual(output, expected[index], f"request {run} got another request's colours or antialias")
+
+
+if __name__ == "__main__":
+    unittest.main()
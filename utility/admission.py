@@ -0,0 +1,52 @@
+from math import ceil
+from threading import Lock
+from typing import Dict
+
+from utility.error import ErrorCode
+from utility.response import BadRequest, ServiceUnavailable
+
+# costs are in pixels processed, a frame of an image counts each of its pixels once
+WORK_BUDGET = 400_000_000
+# a single request can only take part of the budget so one huge gif can't hold up everything else
+MAX_REQUEST_COST = WORK_BUDGET // 2
+MAX_REQUESTS = 32
+# roughly how many pixels a worker gets through a second, used to tell clients when to come back
+COST_PER_SECOND = 40_000_000
+REQUEST_BASE_COST = 1_000_000
+
+
+class AdmissionControl:
+
+    def __init__(self, budget: int, max_request_cost: int, max_requests: int):
+        self.budget = budget
+        self.max_request_cost = max_request_cost
+        self.max_requests = max_requests
+        self.cost = 0
+        self.requests = 0
+        self.rejected = 0
+        self.lock = Lock()
+
+    def acquire(self, cost: int) -> None:
+        if cost > self.max_request_cost:
+            raise BadRequest("The images given are too large to process", ErrorCode.REQUEST_TOO_LARGE)
+
+        with self.lock:
+            if self.requests >= self.max_requests or self.cost + cost > self.budget:
+                self.rejected += 1
+
+                retry_after = max(1, ceil(self.cost / COST_PER_SECOND))
+                raise ServiceUnavailable("The server is busy, try again later", retry_after)
+
+            self.cost += cost
+            self.requests += 1
+
+    def release(self, cost: int) -> None:
+        with self.lock:
+            self.cost -= cost
+            self.requests -= 1
+
+    def stats(self) -> Dict[str, int]:
+        return {"cost": self.cost, "requests": self.requests, "rejected": self.rejected}
+
+
+admission = AdmissionControl(WORK_BUDGET, MAX_REQUEST_COST, MAX_REQUESTS)
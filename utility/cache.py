@@ -0,0 +1,118 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Optional, Dict, List
+
+from flask import Response, request
+
+RESPONSE_CACHE_BYTES = 128 * 1024 * 1024
+# images fetched inside a handler aren't part of the key, so outputs built from them are only kept this long
+RESPONSE_CACHE_TTL = 300
+
+CACHED_HEADERS = ["width", "height", "frames", "Vary"]
+
+
+class CachedResponse:
+
+    def __init__(self, response: Response, ttl: int):
+        self.data = response.get_data()
+        self.status_code = response.status_code
+        self.mimetype = response.mimetype
+        self.headers = {header: response.headers[header] for header in CACHED_HEADERS if header in response.headers}
+        self.expires = time.monotonic() + ttl
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires
+
+    def as_response(self) -> Response:
+        response = Response(self.data, status=self.status_code, mimetype=self.mimetype)
+        response.headers.update(self.headers)
+
+        return response
+
+
+class ResponseCache:
+
+    def __init__(self, max_bytes: int, ttl: int):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = Lock()
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry.expired:
+                del self.entries[key]
+                self.size -= len(entry.data)
+                entry = None
+
+            if entry:
+                self.entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+
+            return entry
+
+    def put(self, key: str, response: Response) -> None:
+        if response.status_code != 200:
+            return
+
+        # send_file responses pass their buffer straight through, reading it makes the body a plain sequence again
+        if response.direct_passthrough:
+            response.direct_passthrough = False
+            response.make_sequence()
+
+        # streamed responses are only produced while they are sent so they can't be kept
+        if response.is_streamed:
+            return
+
+        entry = CachedResponse(response, self.ttl)
+        if len(entry.data) > self.max_bytes // 8:
+            return
+
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous:
+                self.size -= len(previous.data)
+
+            self.entries[key] = entry
+            self.size += len(entry.data)
+
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted.data)
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self.entries), "bytes": self.size, "hits": self.hits, "misses": self.misses}
+
+
+response_cache = ResponseCache(RESPONSE_CACHE_BYTES, RESPONSE_CACHE_TTL)
+
+
+def get_response_key(name: str, authorization_type: Optional[str], bucket: str, sources: List[bytes]) -> str:
+    body = request.get_json(silent=True)
+    if body is None:
+        body = request.get_data()
+    else:
+        body = json.dumps(body, sort_keys=True, separators=(",", ":")).encode()
+
+    queries = json.dumps(sorted(request.args.items(multi=True)), separators=(",", ":"))
+
+    key = hashlib.sha256()
+    for part in [name, request.method, str(authorization_type), bucket, queries, request.headers.get("Accept", "")]:
+        key.update(part.encode())
+        key.update(b"\0")
+
+    key.update(hashlib.sha256(body).digest())
+    for source in sources:
+        key.update(hashlib.sha256(source).digest())
+
+    return key.hexdigest()
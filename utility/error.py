@@ -29,4 +29,6 @@ class ErrorCode(Enum):
     INVALID_BODY_BYTES = ErrorType(8, "Body was not valid bytes")
     INVALID_IMAGE_BYTES = ErrorType(9, "Body bytes could not be formed to a proper image")
     VALUE_MISSING = ErrorType(10, "A value is missing from the queries, fields or body")
+    IMAGE_TOO_LARGE = ErrorType(11, "Url content was larger than the allowed size")
+    REQUEST_TOO_LARGE = ErrorType(12, "The request would take too much work to process")
 
@@ -0,0 +1,94 @@
+import time
+from typing import Dict
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.exceptions import MissingSchema, ConnectionError, InvalidSchema, InvalidURL, Timeout
+
+from utility.error import ErrorCode
+from utility.response import BadRequest
+
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUT = 10
+DEADLINE = 15
+MAX_BYTES = 32 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+
+IMAGE_SIGNATURES = [
+    b"\x89PNG\r\n\x1a\n",
+    b"GIF87a",
+    b"GIF89a",
+    b"\xff\xd8\xff",
+    b"BM",
+    b"II*\x00",
+    b"MM\x00*",
+    b"\x00\x00\x01\x00"
+]
+
+
+def create_session() -> requests.Session:
+    new_session = requests.Session()
+    new_session.mount("http://", HTTPAdapter(pool_connections=16, pool_maxsize=32))
+    new_session.mount("https://", HTTPAdapter(pool_connections=16, pool_maxsize=32))
+
+    return new_session
+
+
+session = create_session()
+
+
+def reset_session() -> None:
+    # for a process that was just forked, the pooled connections it copied are its parent's sockets
+    global session
+    session = create_session()
+
+
+class FetchResponse:
+
+    def __init__(self, status_code: int, headers: Dict[str, str], content: bytes):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+
+def is_image(data: bytes) -> bool:
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return True
+
+    return any(data.startswith(signature) for signature in IMAGE_SIGNATURES)
+
+
+def fetch(url: str, name: str = "Unknown", name_type: str = "N/A", headers: Dict[str, str] = None) -> FetchResponse:
+    deadline = time.monotonic() + DEADLINE
+
+    try:
+        with session.get(url, headers=headers, stream=True, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)) as response:
+            if response.status_code == 304:
+                return FetchResponse(response.status_code, response.headers, b"")
+
+            content_length = response.headers.get("Content-Length")
+            if content_length and content_length.isdigit() and int(content_length) > MAX_BYTES:
+                raise BadRequest(f"The {name_type} {name} is larger than {MAX_BYTES} bytes", ErrorCode.IMAGE_TOO_LARGE)
+
+            data = bytearray()
+            for chunk in response.iter_content(CHUNK_SIZE):
+                checked = len(data) >= 12
+                data += chunk
+
+                if not checked and len(data) >= 12 and not is_image(data):
+                    raise BadRequest(f"The {name_type} {name} could not be formed to an image", ErrorCode.INVALID_IMAGE_URL)
+
+                if len(data) > MAX_BYTES:
+                    raise BadRequest(f"The {name_type} {name} is larger than {MAX_BYTES} bytes", ErrorCode.IMAGE_TOO_LARGE)
+
+                if time.monotonic() > deadline:
+                    raise BadRequest(f"Site took too long to respond for the {name_type} {name}", ErrorCode.URL_TIMEOUT)
+
+            if not is_image(data):
+                raise BadRequest(f"The {name_type} {name} could not be formed to an image", ErrorCode.INVALID_IMAGE_URL)
+
+            return FetchResponse(response.status_code, response.headers, bytes(data))
+    except (MissingSchema, InvalidSchema, InvalidURL):
+        raise BadRequest(f"Invalid url given for the {name_type} {name}", ErrorCode.INVALID_URL)
+    except (ConnectionError, Timeout):
+        raise BadRequest(f"Site took too long to respond for the {name_type} {name}", ErrorCode.URL_TIMEOUT)
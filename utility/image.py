@@ -1,23 +1,94 @@
+import multiprocessing
+import os
+import pickle
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from io import BytesIO
-from math import ceil
-from typing import Tuple, List, Callable
+from itertools import chain
+from math import ceil, floor
+from threading import Lock, BoundedSemaphore
+from typing import Tuple, List, Callable, Optional, Dict, Iterator, Union
 from urllib.parse import urlparse, urlencode
 
-import requests
-from PIL import Image, ImageOps, ImageDraw, ImageFont, ImageSequence, UnidentifiedImageError
-from flask import Response, send_file
-from requests.exceptions import MissingSchema, ConnectionError, InvalidSchema, InvalidURL
+from PIL import Image, ImageOps, ImageDraw, ImageFont, ImageSequence, UnidentifiedImageError, GifImagePlugin, ImageChops, \
+    features
+from flask import Response, send_file, request
 
 from utility import config
 from utility.error import ErrorCode
+from utility.fetch import fetch, FetchResponse
+from utility.raster import SUPERSAMPLE, ANALYTIC, antialiased_ellipse
 from utility.response import BadRequest
 
 IMAGE_ASSET_PATH = "resources/images/"
 FONT_ASSET_PATH = "resources/fonts/"
 
-
-def get_text_array(text: str, font: ImageFont, max_width: int, width: int = 0, strip: bool = True,
-                   max_lines: int = -1) -> List[str]:
+IMAGE_CACHE_BYTES = 256 * 1024 * 1024
+IMAGE_CACHE_TTL = 300
+
+FETCH_WORKERS = 16
+
+# lanczos spreads an ellipse 3 pixels out when its mask is scaled down and weighs 3 more around each of those, a
+# mask cut any closer than that comes out different
+ELLIPSE_MARGIN = 8
+
+FRAME_WORKERS = os.cpu_count() or 1
+PARALLEL_FRAME_COUNT = 16
+# requests that can hand frames to the pool at once, any more wait for one of them to finish
+FRAME_POOL_REQUESTS = 2
+
+FONT_CACHE_SIZE = 256
+TEXT_WIDTH_CACHE_SIZE = 8192
+FONT_PRELOAD = [
+    ("poppins/Poppins-Medium.ttf", 18),
+    ("poppins/Poppins-Medium.ttf", 21),
+    ("poppins/Poppins-Medium.ttf", 32),
+    ("poppins/Poppins-Medium.ttf", 40),
+    ("whitney/Whitney-Medium.ttf", 34),
+    ("whitney/whitney-book.otf", 34),
+    ("whitney/WhitneyLight.ttf", 24),
+    ("gotham/Gotham-Black.otf", 25),
+    ("gotham/GothamBook.ttf", 20),
+    ("gotham/GothamBold.ttf", 21),
+    ("segoeuireg.ttf", 25),
+    ("uni-sans.otf", 50),
+    *[("roboto/RobotoMono-Bold.ttf", size * antialias) for size in (10, 15) for antialias in range(1, 6)],
+    *[("roboto/RobotoMono-Regular.ttf", 50 * antialias) for antialias in range(1, 6)]
+]
+
+# (format, mimetype, save options), the options were picked by encoding the chart, tweet and overlay outputs:
+# fast-png is ~2.4x quicker than png for ~25% more bytes, webp ~7x smaller than png in the same time and lossless
+# animated webp is slightly quicker than gif at less than half the size without quantizing to 256 colours
+PNG = ("png", "image/png", {})
+FAST_PNG = ("png", "image/png", {"compress_level": 1})
+WEBP = ("webp", "image/webp", {"quality": 80, "method": 4})
+GIF = ("gif", "image/gif", {"optimize": True, "disposal": 2})
+APNG = ("png", "image/apng", {"compress_level": 1})
+ANIMATED_WEBP = ("webp", "image/webp", {"lossless": True, "quality": 0, "method": 0})
+
+STATIC_FORMATS = {"png": PNG, "gif": PNG, "apng": PNG, "fast-png": FAST_PNG, "webp": WEBP}
+ANIMATED_FORMATS = {"gif": GIF, "png": APNG, "apng": APNG, "fast-png": APNG, "webp": ANIMATED_WEBP}
+
+# only mimetypes the client names explicitly are picked up, wildcards keep the png/gif defaults
+ACCEPT_FORMATS = [("image/webp", "webp"), ("image/apng", "apng")]
+
+# private GifImagePlugin helpers the streamed gif writer is built from, they aren't part of pillow's api and can change
+# between releases, without them gifs are saved in one go
+GIF_WRITER_HELPERS = ["_get_global_header", "_write_frame_data", "_normalize_mode", "_normalize_palette",
+                      "_get_background", "_get_palette_bytes"]
+
+# keep gif frames which share the global palette in "P" mode so colour transforms can work on the palette alone.
+# this is a pillow module global for the whole process and it's read every time a frame is seeked to, long after the
+# image was opened, so it can't be set around opening one image without racing other threads. every gif decoded
+# anywhere in the process gets it: frames after the first come out "P" instead of "RGB" while they share the global
+# palette, so code using them converts to the mode it needs first, the same as it already had to for the first frame
+GifImagePlugin.LOADING_STRATEGY = GifImagePlugin.LoadingStrategy.RGB_AFTER_DIFFERENT_PALETTE_ONLY
+
+
+def get_text_lines(text: str, font: ImageFont, max_width: int, width: int = 0, strip: bool = True,
+                   max_lines: int = -1) -> List[Tuple[str, int]]:
     text = text.strip() if strip else text
 
     final_lines = []
@@ -28,36 +99,32 @@ def get_text_array(text: str, font: ImageFont, max_width: int, width: int = 0, s
 
         lines, builder = [], []
         for i, word in enumerate(text_split):
-            start = 0
-
             if i != len(text_split) - 1:
                 word += " "
 
-            word_length, (word_width, word_height) = len(word), font.getsize(word)
+            word_width = get_text_width(font, word)
             if word_width + width > max_width and word_width > max_width:
+                start = 0
                 while True:
-                    cut_word = word[start:word_length]
-
-                    cut_word_width, cut_word_height = font.getsize(cut_word)
-                    if cut_word_width + width > max_width:
-                        word_length -= 1
+                    end = get_text_break(word, start, font, max_width - width)
+                    if end == start and width == 0:
+                        end += 1
+
+                    cut_word = word[start:end]
+                    if end == len(word):
+                        builder.append(cut_word)
+                        width = get_text_width(font, cut_word)
+                        break
+                    elif start == 0 and width != 0:
+                        builder.append(cut_word)
+                        lines.append("".join(builder))
+                        builder = []
+                        width = 0
+                        start = end
                     else:
-                        if word_length == len(word):
-                            builder.append(cut_word)
-                            width = cut_word_width
-                            break
-                        elif start == 0 and width != 0:
-                            builder.append(cut_word)
-                            lines.append("".join(builder))
-                            builder = []
-                            width = 0
-                            start = word_length
-                            word_length = len(word)
-                        else:
-                            start = word_length
-                            word_length = len(word)
-                            lines.append(cut_word)
-                            width = 0
+                        lines.append(cut_word)
+                        width = 0
+                        start = end
             else:
                 width += word_width
                 if width > max_width:
@@ -73,7 +140,27 @@ def get_text_array(text: str, font: ImageFont, max_width: int, width: int = 0, s
         final_lines += lines
         width = 0
 
-    return final_lines if max_lines == -1 else final_lines[:max_lines]
+    final_lines = final_lines if max_lines == -1 else final_lines[:max_lines]
+
+    return [(line, get_text_width(font, line)) for line in final_lines]
+
+
+def get_text_break(word: str, start: int, font: ImageFont, max_width: int) -> int:
+    # the largest end where word[start:end] still fits, widths only grow as characters are added
+    low, high = start, len(word)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if get_text_width(font, word[start:middle]) > max_width:
+            high = middle - 1
+        else:
+            low = middle
+
+    return low
+
+
+def get_text_array(text: str, font: ImageFont, max_width: int, width: int = 0, strip: bool = True,
+                   max_lines: int = -1) -> List[str]:
+    return [line for line, _ in get_text_lines(text, font, max_width, width, strip, max_lines)]
 
 
 def get_text_newlined(text: str, font: ImageFont, max_width: int, max_lines: int = -1) -> str:
@@ -88,51 +175,333 @@ def get_worker_url(url: str) -> str:
     return "https://" + config.get("worker") + "?" + urlencode({"url": url})
 
 
-def get_image(url: str, name: str = "Unknown", name_type: str = "N/A") -> Image:
+class CachedImage:
+
+    def __init__(self, response: FetchResponse, ttl: int):
+        self.data = response.content
+        self.etag = response.headers.get("ETag")
+        self.last_modified = response.headers.get("Last-Modified")
+        self.expires = time.monotonic() + ttl
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires
+
+    def validators(self) -> Dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+
+        return headers
+
+
+class ImageCache:
+
+    def __init__(self, max_bytes: int, ttl: int):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.lock = Lock()
+
+    def get_ttl(self, response: FetchResponse) -> Optional[int]:
+        ttl = self.ttl
+        for directive in response.headers.get("Cache-Control", "").lower().split(","):
+            directive = directive.strip()
+            if directive == "no-store":
+                return None
+            elif directive == "no-cache":
+                ttl = 0
+            elif directive.startswith("max-age="):
+                try:
+                    ttl = min(ttl, int(directive[8:]))
+                except ValueError:
+                    pass
+
+        return ttl
+
+    def get(self, url: str) -> Optional[CachedImage]:
+        with self.lock:
+            entry = self.entries.get(url)
+            if entry:
+                self.entries.move_to_end(url)
+
+                if not entry.expired:
+                    self.hits += 1
+
+            return entry
+
+    def put(self, url: str, response: FetchResponse) -> None:
+        ttl = self.get_ttl(response)
+
+        with self.lock:
+            self.misses += 1
+
+            if ttl is None or response.status_code != 200 or len(response.content) > self.max_bytes // 8:
+                return
+
+            previous = self.entries.pop(url, None)
+            if previous:
+                self.size -= len(previous.data)
+
+            self.entries[url] = CachedImage(response, ttl)
+            self.size += len(response.content)
+
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted.data)
+
+    def refresh(self, entry: CachedImage, response: FetchResponse) -> None:
+        ttl = self.get_ttl(response)
+
+        with self.lock:
+            self.revalidations += 1
+            entry.expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self.entries), "bytes": self.size, "hits": self.hits, "misses": self.misses,
+                "revalidations": self.revalidations}
+
+
+image_cache = ImageCache(IMAGE_CACHE_BYTES, IMAGE_CACHE_TTL)
+
+
+def get_image_bytes(url: str, name: str = "Unknown", name_type: str = "N/A") -> bytes:
+    url = get_worker_url(url)
+
+    entry = image_cache.get(url)
+    if entry and not entry.expired:
+        return entry.data
+
+    response = fetch(url, name, name_type, entry.validators() if entry else None)
+    if entry and response.status_code == 304:
+        image_cache.refresh(entry, response)
+        return entry.data
+
+    image_cache.put(url, response)
+
+    return response.content
+
+
+def open_image(data: bytes, name: str = "Unknown", name_type: str = "N/A") -> Image:
     try:
-        return Image.open(BytesIO(requests.get(get_worker_url(url), stream=True).content))
-    except (MissingSchema, InvalidSchema, InvalidURL):
-        raise BadRequest(f"Invalid url given for the {name_type} {name}", ErrorCode.INVALID_URL)
+        return Image.open(BytesIO(data))
     except UnidentifiedImageError:
         raise BadRequest(f"The {name_type} {name} could not be formed to an image", ErrorCode.INVALID_IMAGE_URL)
-    except ConnectionError:
-        raise BadRequest(f"Site took too long to respond for the {name_type} {name}", ErrorCode.URL_TIMEOUT)
+
+
+def get_image(url: str, name: str = "Unknown", name_type: str = "N/A") -> Image:
+    return open_image(get_image_bytes(url, name, name_type), name, name_type)
+
+
+class ImageInfo:
+
+    def __init__(self, size: Tuple[int, int], mode: str, frames: int):
+        self.size = size
+        self.mode = mode
+        self.frames = frames
+
+    @property
+    def pixels(self) -> int:
+        return self.size[0] * self.size[1] * self.frames
+
+
+def count_gif_frames(data: bytes) -> int:
+    # walks the gif blocks and skips over their data instead of seeking Pillow through every frame
+    length = len(data)
+    if length < 13:
+        return 1
+
+    position = 13
+    if data[10] & 0x80:
+        position += 3 << ((data[10] & 7) + 1)
+
+    frames = 0
+    while position < length:
+        block = data[position]
+        if block == 0x2C:
+            frames += 1
+            if position + 10 > length:
+                break
+
+            flags = data[position + 9]
+            position += 10
+            if flags & 0x80:
+                position += 3 << ((flags & 7) + 1)
+
+            # lzw minimum code size
+            position += 1
+        elif block == 0x21:
+            position += 2
+        else:
+            break
+
+        while position < length:
+            size = data[position]
+            position += size + 1
+            if size == 0:
+                break
+
+    return max(frames, 1)
+
+
+def get_image_info(image: Image, data: bytes) -> ImageInfo:
+    # only the header has been read at this point, the pixel data is untouched
+    frames = count_gif_frames(data) if image.format == "GIF" else getattr(image, "n_frames", 1)
+
+    return ImageInfo(image.size, image.mode, frames)
+
+
+fetch_executor = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix="fetch")
+
+
+def reset_fetch_executor() -> None:
+    # threads aren't copied by fork, an executor that started some before it would wait on them forever
+    global fetch_executor
+    fetch_executor = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix="fetch")
+
+
+def get_images_bytes(queries: List[Tuple[str, str, str]]) -> List[bytes]:
+    if len(queries) < 2:
+        return [get_image_bytes(*query) for query in queries]
+
+    return list(fetch_executor.map(lambda query: get_image_bytes(*query), queries))
+
+
+def get_images(queries: List[Tuple[str, str, str]]) -> List[type(Image)]:
+    return [open_image(data, name, name_type) for data, (_, name, name_type) in zip(get_images_bytes(queries), queries)]
+
+
+image_assets = {}
+
+
+def load_image_assets() -> None:
+    for directory, _, files in os.walk(IMAGE_ASSET_PATH):
+        for file in files:
+            path = os.path.join(directory, file)
+            with Image.open(path) as image:
+                asset = image.convert("RGBA") if image.mode == "P" else image.copy()
+
+            image_assets[os.path.relpath(path, IMAGE_ASSET_PATH).replace(os.sep, "/")] = asset
 
 
 def get_image_asset(path: str) -> Image:
-    return Image.open(IMAGE_ASSET_PATH + path)
+    # assets are shared between requests, copy them before drawing on them
+    if not image_assets:
+        load_image_assets()
+
+    asset = image_assets.get(path)
+    if asset is None:
+        raise FileNotFoundError(IMAGE_ASSET_PATH + path)
+
+    return asset
+
 
+def get_images_or_assets(queries: List[Tuple[str, str, str]]) -> List[type(Image)]:
+    images, remote = [], []
+    for index, (url, name, name_type) in enumerate(queries):
+        if not isinstance(url, str):
+            error_code = ErrorCode.INVALID_FIELD_VALUE if name_type == "field" else ErrorCode.INVALID_QUERY_VALUE
+            raise BadRequest(f"The {name_type} {name} is not a string", error_code)
 
+        try:
+            images.append(get_image_asset(url))
+        except FileNotFoundError:
+            # anything that isn't an asset is fetched, other errors go to the caller
+            images.append(None)
+            remote.append(index)
+
+    for index, image in zip(remote, get_images([queries[index] for index in remote])):
+        images[index] = image
+
+    return images
+
+
+@lru_cache(maxsize=FONT_CACHE_SIZE)
 def get_font_asset(path: str, size: int) -> ImageFont:
     return ImageFont.truetype(FONT_ASSET_PATH + path, size)
 
 
-def draw_ellipse(image, bounds, width=1, outline="white", antialias=4):
-    mask = Image.new(size=[int(dim * antialias) for dim in image.size], mode="L", color="black")
-    draw = ImageDraw.Draw(mask)
+def load_font_assets() -> None:
+    for path, size in FONT_PRELOAD:
+        get_font_asset(path, size)
+
 
+def draw_ellipse(image, bounds, width=1, outline="white", antialias=4, render_mode=SUPERSAMPLE):
     offset = width / -2.0
-    left, top = [(value + offset) * antialias for value in bounds[:2]]
-    right, bottom = [(value - offset) * antialias for value in bounds[2:]]
-    draw.ellipse((left, top, right, bottom), fill="white")
+    left, top = [value + offset for value in bounds[:2]]
+    right, bottom = [value - offset for value in bounds[2:]]
 
-    mask = mask.resize(image.size, Image.LANCZOS)
+    if render_mode == ANALYTIC:
+        antialiased_ellipse(image, (left, top, right, bottom), outline)
+        return
 
-    image.paste(outline, mask=mask)
+    # only the part of the image around the ellipse is drawn bigger, the rest of the mask would stay black
+    box = (max(0, floor(left) - ELLIPSE_MARGIN), max(0, floor(top) - ELLIPSE_MARGIN),
+           min(image.width, ceil(right) + ELLIPSE_MARGIN), min(image.height, ceil(bottom) + ELLIPSE_MARGIN))
+    if box[0] >= box[2] or box[1] >= box[3]:
+        return
+
+    mask = Image.new(size=[int((box[2] - box[0]) * antialias), int((box[3] - box[1]) * antialias)], mode="L",
+                     color="black")
+    draw = ImageDraw.Draw(mask)
+    draw.ellipse(((left - box[0]) * antialias, (top - box[1]) * antialias, (right - box[0]) * antialias,
+                  (bottom - box[1]) * antialias), fill="white")
+
+    mask = mask.resize((box[2] - box[0], box[3] - box[1]), Image.LANCZOS)
+
+    image.paste(outline, box, mask)
+
+
+@lru_cache(maxsize=TEXT_WIDTH_CACHE_SIZE)
+def get_text_width(font: ImageFont, text: str) -> int:
+    return font.getsize(text)[0]
 
 
 def get_font_optimal(path: str, start: int, text: str, max_width: float) -> ImageFont:
-    font = get_font_asset(path, start)
-    while font.getsize(text)[0] > max_width:
-        start -= 1
-        font = get_font_asset(path, start)
+    def get_width(size: int) -> int:
+        return get_text_width(get_font_asset(path, size), text)
 
-    return font
+    width = get_width(start)
+    if width <= max_width:
+        return get_font_asset(path, start)
 
+    # scale the size down proportionally until it fits, the width is roughly linear to the size
+    low, high = start, start
+    while low > 1:
+        low = max(1, min(high - 1, int(low * max_width / width)))
+        width = get_width(low)
+        if width <= max_width:
+            break
 
-def create_avatar(image: Image, antialias: int = 4) -> Image:
+        high = low
+
+    guess = min(high - 1, int(low * max_width / width) + 1)
+    if guess > low:
+        if get_width(guess) <= max_width:
+            low = guess
+        else:
+            high = guess
+
+    while high - low > 1:
+        middle = (low + high) // 2
+        if get_width(middle) <= max_width:
+            low = middle
+        else:
+            high = middle
+
+    return get_font_asset(path, low)
+
+
+def create_avatar(image: Image, antialias: int = 4, render_mode: str = SUPERSAMPLE) -> Image:
     mask = Image.new("L", image.size, 0)
-    draw_ellipse(mask, (0, 0) + image.size, antialias=antialias)
+    draw_ellipse(mask, (0, 0) + image.size, antialias=antialias, render_mode=render_mode)
 
     output = ImageOps.fit(image, mask.size, centering=(0.5, 0.5))
     output.putalpha(mask)
@@ -162,6 +531,50 @@ def resize_to_ratio(image: Image, size: Tuple[int, int]) -> Image:
     return crop_to_center(image, size)
 
 
+LINE_STRIP_WIDTH = 64
+
+
+def get_strip_boxes(lines: List[Tuple[Tuple[float, float], Tuple[float, float]]], padding: int, size: Tuple[int, int],
+                    strip_width: int = LINE_STRIP_WIDTH) -> List[Tuple[int, int, int, int]]:
+    # splits an image of size into columns and gives the rows of each that lines drawn up to padding wide can cover, a
+    # polygon's fill isn't always inside its edges so it can't be bounded this way
+    columns = ceil(size[0] / strip_width)
+    tops, bottoms = [None] * columns, [None] * columns
+    for (x0, y0), (x1, y1) in lines:
+        # only the columns around the line are looked at, so many short lines don't each go over every column
+        first = max(0, floor((min(x0, x1) - padding) / strip_width) - 1)
+        last = min(columns - 1, floor((max(x0, x1) + padding) / strip_width))
+        for column in range(first, last + 1):
+            left = column * strip_width
+            right = min(size[0], left + strip_width)
+
+            start, end = max(min(x0, x1), left - padding), min(max(x0, x1), right + padding)
+            if start > end:
+                continue
+
+            if x0 == x1:
+                y_values = (y0, y1)
+            else:
+                slope = (y1 - y0) / (x1 - x0)
+                y_values = (y0 + slope * (start - x0), y0 + slope * (end - x0))
+
+            top, bottom = tops[column], bottoms[column]
+            tops[column] = min(y_values) if top is None else min(top, *y_values)
+            bottoms[column] = max(y_values) if bottom is None else max(bottom, *y_values)
+
+    boxes = []
+    for column, (top, bottom) in enumerate(zip(tops, bottoms)):
+        if top is None:
+            continue
+
+        left = column * strip_width
+        top, bottom = max(0, floor(top) - padding), min(size[1], ceil(bottom) + padding + 1)
+        if top < bottom:
+            boxes.append((left, top, min(size[0], left + strip_width), bottom))
+
+    return boxes
+
+
 def max_pixels(image_size: Tuple[int, int], max_size: int) -> Tuple[int, int]:
     width, height = image_size
     if width and height < max_size:
@@ -171,34 +584,356 @@ def max_pixels(image_size: Tuple[int, int], max_size: int) -> Tuple[int, int]:
     return ceil(width / ratio), ceil(height / ratio)
 
 
-def for_each_frame(image: Image, function: Callable[[type(Image)], type(Image)]) -> List[type(Image)]:
+# like Image.thumbnail, images are only shrunk to twice the size they are resized to so the final resize still has
+# pixels to filter. it isn't the same as resizing the full size image, fine detail can come out a few levels off
+REDUCING_GAP = 2
+REDUCE_MODES = ["L", "LA", "RGB", "RGBA", "CMYK"]
+
+
+def reduce_image(image: Image, target_size: Optional[Tuple[int, int]]) -> Image:
+    # every frame of an animation has to be decoded whatever size it ends up, so only still images are reduced
+    if not target_size or getattr(image, "n_frames", 1) > 1:
+        return image
+
+    width, height = target_size[0] * REDUCING_GAP, target_size[1] * REDUCING_GAP
+
+    # jpegs are scaled while their blocks are decoded, before any pixels exist at the full size
+    if image.format == "JPEG":
+        image.draft(None, (width, height))
+
+    # one factor for both axes keeps the aspect ratio, handlers crop or stretch to their size from the whole image
+    factor = max(1, min(image.size[0] // width, image.size[1] // height))
+    if factor == 1:
+        return image
+
+    if image.mode not in REDUCE_MODES:
+        image = image.convert("RGBA")
+
+    return image.reduce(factor)
+
+
+frame_pool = None
+frame_pool_pid = None
+frame_pool_lock = Lock()
+frame_pool_slots = BoundedSemaphore(FRAME_POOL_REQUESTS)
+
+
+def get_frame_context():
+    # the pool's processes are started clean rather than forked from a worker whose other threads can be holding locks
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(["utility.image"])
+        return context
+
+    return multiprocessing.get_context("spawn")
+
+
+def get_frame_pool():
+    global frame_pool, frame_pool_pid
+
+    with frame_pool_lock:
+        # a pool belongs to the process that started it, a forked worker starts its own the first time it's needed
+        if frame_pool is None or frame_pool_pid != os.getpid():
+            frame_pool = get_frame_context().Pool(FRAME_WORKERS)
+            frame_pool_pid = os.getpid()
+
+        return frame_pool
+
+
+def reset_frame_pool() -> None:
+    # for a process that was just forked, the pool and locks it copied belong to its parent
+    global frame_pool, frame_pool_pid, frame_pool_lock, frame_pool_slots
+
+    frame_pool, frame_pool_pid = None, None
+    frame_pool_lock = Lock()
+    frame_pool_slots = BoundedSemaphore(FRAME_POOL_REQUESTS)
+
+
+def is_picklable(value: object) -> bool:
+    try:
+        pickle.dumps(value)
+    except Exception:
+        return False
+
+    return True
+
+
+def apply_frame_function(function: Callable[[type(Image)], type(Image)],
+                         frames: List[type(Image)]) -> List[type(Image)]:
+    return [function(frame) for frame in frames]
+
+
+def for_each_frame_parallel(frames: List[type(Image)],
+                            function: Callable[[type(Image)], type(Image)]) -> List[type(Image)]:
+    # the frames and the function are pickled over to the pool, so the function has to be a module level one or a
+    # functools.partial of one
+    frame_count = len(frames)
+    workers = min(FRAME_WORKERS, frame_count)
+    chunk_size = ceil(frame_count / (workers * 4))
+    chunks = [(function, frames[i:i + chunk_size]) for i in range(0, frame_count, chunk_size)]
+
+    with frame_pool_slots:
+        return [frame for chunk in get_frame_pool().starmap(apply_frame_function, chunks) for frame in chunk]
+
+
+class FrameSequence:
+
+    def __init__(self, image: Image, function: Callable[[type(Image)], type(Image)],
+                 palette_function: Callable[[type(Image)], type(Image)] = None):
+        self.image = image
+        self.function = function
+        self.palette_function = palette_function
+
+    def __len__(self):
+        return getattr(self.image, "n_frames", 1)
+
+    def __iter__(self) -> Iterator[type(Image)]:
+        # every frame is quantized on its own when streamed so a paletted frame can always keep its palette
+        for frame in ImageSequence.Iterator(self.image):
+            if self.palette_function is not None and frame.mode == "P":
+                yield self.palette_function(frame)
+            else:
+                yield self.function(frame)
+
+
+def for_each_frame(image: Image, function: Callable[[type(Image)], type(Image)],
+                   palette_function: Callable[[type(Image)], type(Image)] = None, parallel: bool = False,
+                   stream: bool = False) -> Union[List[type(Image)], FrameSequence]:
+    # palette_function has to give the same colours as function when its output is converted to RGBA, it is only
+    # used while every frame is paletted so the frames can be saved without being quantized again
+    if stream and getattr(image, "n_frames", 1) > 1:
+        return FrameSequence(image, function, palette_function)
+
+    # closures can't be sent to the pool, they're run here instead
+    if parallel and FRAME_WORKERS > 1 and getattr(image, "n_frames", 1) >= PARALLEL_FRAME_COUNT \
+            and is_picklable((function, palette_function)):
+        frames = [frame.copy() for frame in ImageSequence.Iterator(image)]
+        if palette_function is not None and all(frame.mode == "P" for frame in frames):
+            return for_each_frame_parallel(frames, palette_function)
+
+        return for_each_frame_parallel(frames, function)
+
     frames = []
+    paletted = palette_function is not None
     for frame in ImageSequence.Iterator(image):
-        frames.append(function(frame))
+        if paletted and frame.mode != "P":
+            paletted = False
+            frames = [paletted_frame.convert("RGBA") for paletted_frame in frames]
+
+        frames.append(palette_function(frame) if paletted else function(frame))
 
     return frames
 
 
-def get_image_response(frames: List[type(Image)], transparency: int = 0, loop: bool = False,
+def get_gif_frame(frame: Image) -> Image:
+    # a png can give every palette entry its own alpha where a gif only has one transparent index, those frames are
+    # quantized again from RGBA
+    if frame.mode == "P" and not isinstance(frame.info.get("transparency", 0), int):
+        return frame.convert("RGBA")
+
+    return frame
+
+
+def write_gif_frame(frame: Image, bbox: Optional[Tuple[int, int, int, int]], info: dict) -> bytes:
+    b = BytesIO()
+    if bbox is None:
+        for header in GifImagePlugin._get_global_header(frame, info):
+            b.write(header)
+
+        GifImagePlugin._write_frame_data(b, frame, (0, 0), info)
+    else:
+        info["include_color_table"] = True
+        GifImagePlugin._write_frame_data(b, frame.crop(bbox), bbox[:2], info)
+
+    return b.getvalue()
+
+
+def get_gif_chunks(frames: Iterator[type(Image)], transparency: Optional[int], loop: bool) -> Iterator[bytes]:
+    # follows GifImagePlugin._write_multiple_frames with disposal 2, a frame is written as soon as the next one shows it
+    # isn't a duplicate so only one encoded frame is held at a time
+    info = {"loop": loop, "optimize": True, "disposal": 2}
+    if transparency is not None:
+        info["transparency"] = transparency
+
+    first_frame, first_palette, background, duration = None, None, None, None
+    pending = None
+    for frame in map(get_gif_frame, frames):
+        gif_frame = GifImagePlugin._normalize_mode(frame.copy())
+        if first_frame is None:
+            first_frame = frame
+            duration = frame.info.get("duration")
+            for key, value in gif_frame.info.items():
+                info.setdefault(key, value)
+
+        gif_frame = GifImagePlugin._normalize_palette(gif_frame, None, info)
+        frame_info = info.copy()
+        if frame.mode == "P":
+            frame_info.pop("transparency", None)
+            if "transparency" in frame.info:
+                frame_info["transparency"] = frame.info["transparency"]
+
+        if pending is None:
+            first_palette = gif_frame.palette
+            bbox = None
+        else:
+            if background is None:
+                colour = info.get("transparency", first_frame.info.get("transparency", (0, 0, 0)))
+                background = Image.new("P", gif_frame.size, GifImagePlugin._get_background(gif_frame, colour))
+                background.putpalette(first_palette)
+
+            if GifImagePlugin._get_palette_bytes(gif_frame) == GifImagePlugin._get_palette_bytes(background):
+                delta = ImageChops.subtract_modulo(gif_frame, background)
+            else:
+                delta = ImageChops.subtract_modulo(gif_frame.convert("RGB"), background.convert("RGB"))
+
+            bbox = delta.getbbox()
+            if not bbox:
+                if duration:
+                    pending[2]["duration"] += frame_info["duration"]
+
+                continue
+
+            yield write_gif_frame(*pending)
+
+        pending = (gif_frame, bbox, frame_info)
+
+    if pending is not None:
+        yield write_gif_frame(*pending)
+
+    yield b";"
+
+
+def get_gif_stream_response(frames: FrameSequence, transparency: Optional[int], loop: bool,
+                            mimetype: str) -> Optional[Response]:
+    # frames are only produced as the gif is encoded, so the first one is taken off to size the response
+    frame_iterator = iter(frames)
+    first_frame = get_gif_frame(next(frame_iterator))
+    if first_frame.mode == "P":
+        transparency = first_frame.info.get("transparency")
+
+    chunks = get_gif_chunks(chain([first_frame], frame_iterator), transparency, loop)
+    try:
+        # the writer was tried when this module was loaded, this only covers frames it didn't see. nothing has been
+        # sent yet so the gif can still be saved the usual way
+        first_chunk = next(chunks)
+    except (TypeError, AttributeError):
+        return None
+
+    response = Response(chain([first_chunk], chunks), mimetype=mimetype)
+    response.headers["width"] = first_frame.size[0]
+    response.headers["height"] = first_frame.size[1]
+    response.headers["frames"] = len(frames)
+    response.headers["Vary"] = "Accept"
+
+    return response
+
+
+def get_decoded_frames(data: bytes) -> List[bytes]:
+    return [frame.convert("RGBA").tobytes() for frame in ImageSequence.Iterator(Image.open(BytesIO(data)))]
+
+
+def is_gif_streaming_supported() -> bool:
+    # the streamed writer is tried on a few frames and has to decode the same as pillow's own save: the global header,
+    # frames cropped against the background, a frame with its own palette and frames that have to be quantized. if
+    # pillow's helpers have changed in any way, gifs are saved in one go rather than failing part way through a response
+    if not all(hasattr(GifImagePlugin, name) for name in GIF_WRITER_HELPERS):
+        return False
+
+    transparent = Image.new("RGBA", (8, 8), (255, 0, 0, 255))
+    transparent.paste((0, 0, 0, 0), (0, 0, 4, 4))
+    transparent.info["duration"] = 50
+
+    paletted = Image.new("P", (8, 8), 1)
+    paletted.putpalette([0, 0, 0, 0, 0, 255])
+    paletted.info["transparency"] = 0
+
+    frames = [transparent, transparent.copy(), paletted, Image.new("RGB", (8, 8), (0, 255, 0))]
+
+    try:
+        saved = BytesIO()
+        frames[0].save(saved, format="gif", save_all=True, append_images=frames[1:], loop=False, transparency=255,
+                       **GIF[2])
+        streamed = b"".join(get_gif_chunks(iter(frames), 255, False))
+
+        return get_decoded_frames(streamed) == get_decoded_frames(saved.getvalue())
+    except Exception:
+        return False
+
+
+GIF_STREAMING = is_gif_streaming_supported()
+
+
+def is_format_supported(image_format: Tuple[str, str, dict], animated: bool) -> bool:
+    if image_format[0] == "webp":
+        return features.check("webp_anim" if animated else "webp")
+
+    return True
+
+
+def get_image_format(animated: bool) -> Tuple[str, str, dict]:
+    formats = ANIMATED_FORMATS if animated else STATIC_FORMATS
+
+    name = request.args.get("format")
+    if name is not None:
+        image_format = formats.get(name.lower())
+        if image_format is None:
+            raise BadRequest(f"format has to be one of {', '.join(formats)}", ErrorCode.INVALID_QUERY_VALUE)
+
+        if not is_format_supported(image_format, animated):
+            raise BadRequest(f"{name} output is not supported", ErrorCode.INVALID_QUERY_VALUE)
+
+        return image_format
+
+    accepted = {mimetype for mimetype, quality in request.accept_mimetypes if quality > 0}
+    for mimetype, name in ACCEPT_FORMATS:
+        image_format = formats[name]
+        if mimetype in accepted and image_format[1] == mimetype and is_format_supported(image_format, animated):
+            return image_format
+
+    return GIF if animated else PNG
+
+
+def get_image_response(frames: Union[List[type(Image)], FrameSequence], transparency: int = 0, loop: bool = False,
                        quality: int = 100) -> Response:
     frame_count = len(frames)
-    png = frame_count == 1
-    f = "png" if png else "gif"
+    animated = frame_count > 1
+    f, mimetype, options = get_image_format(animated)
+
+    if isinstance(frames, FrameSequence):
+        if f == "gif" and GIF_STREAMING:
+            response = get_gif_stream_response(frames, transparency, loop, mimetype)
+            if response is not None:
+                return response
+
+        frames = list(frames)
 
     first_frame = frames[0]
 
     b = BytesIO()
-    if png:
-        first_frame.save(b, format=f, quality=quality)
+    if not animated:
+        first_frame.save(b, format=f, **{"quality": quality, **options})
+    elif f == "gif":
+        frames = [get_gif_frame(frame) for frame in frames]
+        if all(frame.mode == "P" for frame in frames):
+            transparencies = {frame.info.get("transparency") for frame in frames}
+            if len(transparencies) == 1:
+                transparency = transparencies.pop()
+
+        if transparency is not None:
+            options = {**options, "transparency": transparency}
+
+        first_frame.save(b, format=f, save_all=True, append_images=frames[1:], loop=loop, quality=quality, **options)
     else:
-        first_frame.save(b, format=f, save_all=True, append_images=frames[1:], loop=loop, optimize=True, disposal=2,
-                         transparency=transparency, quality=quality)
+        # frames can have their own palettes which apng and webp can't express, they keep full alpha instead
+        frames = [frame if frame.mode == "RGBA" else frame.convert("RGBA") for frame in frames]
+        frames[0].save(b, format=f, save_all=True, append_images=frames[1:], loop=loop, **options)
 
     b.seek(0)
 
-    response = send_file(b, mimetype=f"image/{f}")
+    response = send_file(b, mimetype=mimetype)
     response.headers["width"] = first_frame.size[0]
     response.headers["height"] = first_frame.size[1]
     response.headers["frames"] = frame_count
+    response.headers["Vary"] = "Accept"
 
     return response
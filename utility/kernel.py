@@ -0,0 +1,117 @@
+from typing import Callable
+
+import numpy as np
+from PIL import Image
+
+
+def apply_kernel(image: Image, kernel: Callable[[np.ndarray], np.ndarray]) -> Image:
+    if image.mode != "RGBA":
+        image = image.convert("RGBA")
+
+    return Image.fromarray(kernel(np.asarray(image)), "RGBA")
+
+
+def apply_palette_kernel(image: Image, kernel: Callable[[np.ndarray], np.ndarray]) -> Image:
+    colours = np.array(image.getpalette(), dtype=np.uint8).reshape(-1, 3)
+    pixels = np.column_stack((colours, np.full(len(colours), 255, dtype=np.uint8)))
+
+    output = image.copy()
+    output.putpalette(kernel(pixels)[:, :3].tobytes())
+
+    return output
+
+
+def clamp(values: np.ndarray) -> np.ndarray:
+    return np.clip(np.trunc(values), 0, 255).astype(np.uint8)
+
+
+def luminance(pixels: np.ndarray) -> np.ndarray:
+    rgb = pixels[..., :3].astype(np.float64)
+
+    return np.sqrt(rgb[..., 0] ** 2 * 0.299 + rgb[..., 1] ** 2 * 0.587 + rgb[..., 2] ** 2 * 0.114)
+
+
+def invert(pixels: np.ndarray) -> np.ndarray:
+    output = pixels.copy()
+    output[..., :3] = 255 - pixels[..., :3]
+
+    return output
+
+
+def christmas(pixels: np.ndarray) -> np.ndarray:
+    o = luminance(pixels)
+    o *= (o - 102) / 128
+
+    output = np.zeros_like(pixels)
+    output[..., 0] = 255
+    output[..., 3] = clamp(255 - o)
+
+    return output
+
+
+def halloween(pixels: np.ndarray) -> np.ndarray:
+    o = luminance(pixels)
+    o *= (o - 102) / 128
+
+    output = np.zeros_like(pixels)
+    output[..., 0] = clamp(o)
+    output[..., 1] = clamp((o - 10) / 2)
+    output[..., 3] = pixels[..., 3]
+
+    return output
+
+
+def rgb_to_hsv(pixels: np.ndarray) -> np.ndarray:
+    rgb = pixels[..., :3].astype(np.float64) / 255
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+
+    maxc, minc = rgb.max(axis=-1), rgb.min(axis=-1)
+    rangec = maxc - minc
+    grey = rangec == 0
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        s = np.where(grey, 0.0, rangec / maxc)
+        rc, gc, bc = [np.where(grey, 0.0, (maxc - c) / rangec) for c in (r, g, b)]
+
+    h = np.where(r == maxc, bc - gc, np.where(g == maxc, 2.0 + rc - bc, 4.0 + gc - rc))
+    h = np.where(grey, 0.0, np.mod(h / 6.0, 1.0))
+
+    return np.stack((h, s, maxc), axis=-1)
+
+
+def hsv_to_rgb(hsv: np.ndarray) -> np.ndarray:
+    h, s, v = hsv[..., 0], hsv[..., 1], hsv[..., 2]
+
+    i = np.trunc(h * 6.0)
+    f = (h * 6.0) - i
+    p = v * (1.0 - s)
+    q = v * (1.0 - s * f)
+    t = v * (1.0 - s * (1.0 - f))
+    i = np.mod(i, 6)
+
+    sectors = [i == 0, i == 1, i == 2, i == 3, i == 4]
+    r = np.select(sectors, [v, q, p, p, t], v)
+    g = np.select(sectors, [t, v, v, q, p], p)
+    b = np.select(sectors, [p, p, t, v, v], q)
+
+    return np.stack((r, g, b), axis=-1)
+
+
+def shift_hue(pixels: np.ndarray, hsv: np.ndarray, degrees: float) -> np.ndarray:
+    shifted = hsv.copy()
+    shifted[..., 0] = ((hsv[..., 0] * 360 + degrees) % 360) / 360
+
+    output = pixels.copy()
+    output[..., :3] = hsv_to_rgb(shifted) * 255
+
+    return output
+
+
+def replace_hue(pixels: np.ndarray, hue: float) -> np.ndarray:
+    hsv = rgb_to_hsv(pixels)
+    hsv[..., 0] = hue
+
+    output = pixels.copy()
+    output[..., :3] = hsv_to_rgb(hsv) * 255
+
+    return output
@@ -0,0 +1,219 @@
+from math import ceil, floor
+from typing import Tuple, List, Any, Optional
+
+import numpy as np
+from PIL import Image, ImageColor
+
+SUPERSAMPLE = "supersample"
+ANALYTIC = "analytic"
+RENDER_MODES = [SUPERSAMPLE, ANALYTIC]
+
+Box = Tuple[int, int, int, int]
+Point = Tuple[float, float]
+
+
+def get_points(xy: Any) -> List[Point]:
+    values = []
+    for value in xy:
+        values.extend(value if isinstance(value, (list, tuple)) else [value])
+
+    return list(zip(values[::2], values[1::2]))
+
+
+def get_box(image: Image.Image, points: List[Point], margin: float) -> Optional[Box]:
+    # whole pixels touched by the points grown by margin, cut down to the image
+    xs, ys = [x for x, _ in points], [y for _, y in points]
+    left, top = max(0, floor(min(xs) - margin)), max(0, floor(min(ys) - margin))
+    right, bottom = min(image.width, ceil(max(xs) + margin) + 1), min(image.height, ceil(max(ys) + margin) + 1)
+
+    if left >= right or top >= bottom:
+        return None
+
+    return left, top, right, bottom
+
+
+def get_centres(box: Box) -> Tuple[np.ndarray, np.ndarray]:
+    # coverage is sampled at the middle of every pixel, a row and a column that broadcast against each other
+    left, top, right, bottom = box
+
+    return np.arange(left, right)[np.newaxis, :] + 0.5, np.arange(top, bottom)[:, np.newaxis] + 0.5
+
+
+def get_sub_box(box: Box, start: Point, end: Point, margin: float) -> Optional[Box]:
+    left, top = max(box[0], floor(min(start[0], end[0]) - margin)), max(box[1], floor(min(start[1], end[1]) - margin))
+    right = min(box[2], ceil(max(start[0], end[0]) + margin) + 1)
+    bottom = min(box[3], ceil(max(start[1], end[1]) + margin) + 1)
+
+    if left >= right or top >= bottom:
+        return None
+
+    return left, top, right, bottom
+
+
+def get_segment_distance(xs: np.ndarray, ys: np.ndarray, start: Point, end: Point) -> np.ndarray:
+    (x0, y0), (x1, y1) = start, end
+    dx, dy = x1 - x0, y1 - y0
+
+    length = dx * dx + dy * dy
+    t = 0 if length == 0 else np.clip(((xs - x0) * dx + (ys - y0) * dy) / length, 0, 1)
+
+    return np.hypot(xs - x0 - t * dx, ys - y0 - t * dy)
+
+
+def get_line_coverage(box: Box, points: List[Point], width: float) -> np.ndarray:
+    # round capped strokes along every segment, a pixel is covered by how far its middle is inside the stroke
+    radius = max(1, width) / 2
+    strength = min(1, width)
+
+    coverage = np.zeros((box[3] - box[1], box[2] - box[0]), dtype=np.float32)
+    for start, end in zip(points, points[1:] or points):
+        sub_box = get_sub_box(box, start, end, radius + 1)
+        if sub_box is None:
+            continue
+
+        xs, ys = get_centres(sub_box)
+        stroke = np.clip(radius + 0.5 - get_segment_distance(xs, ys, start, end), 0, 1) * strength
+
+        area = coverage[sub_box[1] - box[1]:sub_box[3] - box[1], sub_box[0] - box[0]:sub_box[2] - box[0]]
+        np.maximum(area, stroke, out=area)
+
+    return coverage
+
+
+def get_polygon_coverage(box: Box, points: List[Point]) -> np.ndarray:
+    left, top, right, bottom = box
+    width, height = right - left, bottom - top
+    edges = list(zip(points, points[1:] + points[:1]))
+
+    # even-odd inside test at every pixel middle from where each edge crosses the rows
+    crossings = np.zeros((height, width + 1), dtype=np.int8)
+    for (x0, y0), (x1, y1) in edges:
+        if y0 == y1:
+            continue
+
+        rows = np.arange(max(top, ceil(min(y0, y1) - 0.5)), min(bottom, ceil(max(y0, y1) - 0.5)))
+        xs = x0 + (rows + 0.5 - y0) * (x1 - x0) / (y1 - y0)
+        columns = np.clip(np.floor(xs - 0.5).astype(np.int64) + 1 - left, 0, width)
+        np.add.at(crossings, (rows - top, columns), 1)
+
+    # only whether the count is odd matters, so it's fine for it to wrap around
+    inside = (np.cumsum(crossings, axis=1, dtype=np.int8)[:, :width] & 1).astype(bool)
+    coverage = inside.astype(np.float32)
+
+    # pixels within half a pixel of an edge are only partly covered, by how close they are to the nearest edge. that's
+    # the least covered edge for pixels inside and the most covered one for pixels outside
+    for start, end in edges:
+        sub_box = get_sub_box(box, start, end, 1)
+        if sub_box is None:
+            continue
+
+        rows, columns = slice(sub_box[1] - top, sub_box[3] - top), slice(sub_box[0] - left, sub_box[2] - left)
+        xs, ys = get_centres(sub_box)
+        distance = get_segment_distance(xs, ys, start, end)
+
+        area, area_inside = coverage[rows, columns], inside[rows, columns]
+        edge = np.clip(0.5 + np.where(area_inside, distance, -distance), 0, 1)
+        coverage[rows, columns] = np.where(area_inside, np.minimum(area, edge), np.maximum(area, edge))
+
+    return coverage
+
+
+def get_ellipse_coverage(box: Box, bounds: Tuple[float, float, float, float]) -> np.ndarray:
+    x0, y0, x1, y1 = bounds
+    a, b = (x1 - x0) / 2, (y1 - y0) / 2
+    if a <= 0 or b <= 0:
+        return np.zeros((box[3] - box[1], box[2] - box[0]), dtype=np.float32)
+
+    xs, ys = get_centres(box)
+    dx, dy = xs - (x0 + a), ys - (y0 + b)
+
+    # the implicit function over the length of its gradient is close to the distance to the edge near it
+    implicit = (dx / a) ** 2 + (dy / b) ** 2 - 1
+    gradient = 2 * np.hypot(dx / (a * a), dy / (b * b))
+
+    return np.clip(0.5 - implicit / np.maximum(gradient, 1e-6), 0, 1)
+
+
+def get_rectangle_coverage(box: Box, bounds: Tuple[float, float, float, float]) -> np.ndarray:
+    # edges lined up with the pixels make the covered area of each pixel a product of its row and column
+    x0, y0, x1, y1 = bounds
+    xs, ys = get_centres(box)
+
+    columns = np.clip(np.minimum(xs + 0.5, max(x0, x1)) - np.maximum(xs - 0.5, min(x0, x1)), 0, 1)
+    rows = np.clip(np.minimum(ys + 0.5, max(y0, y1)) - np.maximum(ys - 0.5, min(y0, y1)), 0, 1)
+
+    return rows * columns
+
+
+def draw_coverage(image: Image.Image, box: Box, coverage: np.ndarray, fill: Any) -> None:
+    # blends fill in by coverage the same way averaging pixels drawn over each other at a higher resolution would
+    if image.mode != "RGBA":
+        mask = Image.fromarray(np.rint(coverage * 255).astype(np.uint8), "L")
+        image.paste(fill, box, mask)
+        return
+
+    colour = ImageColor.getcolor(fill, "RGBA") if isinstance(fill, str) else tuple(fill)
+    if len(colour) == 3:
+        colour += (255,)
+
+    pixels = np.array(image.crop(box))
+    # fully covered pixels are just replaced like pillow's own drawing does, only the edges are blended
+    pixels.view(np.uint32)[..., 0][coverage >= 1] = np.array(colour, dtype=np.uint8).view(np.uint32)[0]
+
+    edges = (coverage > 0) & (coverage < 1)
+    if edges.any():
+        amount = coverage[edges][:, np.newaxis]
+        destination = pixels[edges].astype(np.float32)
+
+        destination_alpha = destination[:, 3:] / 255
+        source_alpha = colour[3] / 255
+
+        alpha = source_alpha * amount + destination_alpha * (1 - amount)
+        premultiplied = np.array(colour[:3], dtype=np.float32) * source_alpha * amount + \
+            destination[:, :3] * destination_alpha * (1 - amount)
+
+        rgb = np.divide(premultiplied, alpha, out=np.zeros_like(premultiplied), where=alpha > 0)
+        pixels[edges] = np.clip(np.rint(np.concatenate((rgb, alpha * 255), axis=1)), 0, 255).astype(np.uint8)
+
+    image.paste(Image.fromarray(pixels, "RGBA"), box)
+
+
+def antialiased_line(image: Image.Image, xy: Any, fill: Any, width: float = 1) -> None:
+    # pillow draws lines without a width a pixel wide
+    width = width or 1
+    points = get_points(xy)
+    box = get_box(image, points, max(1, width) / 2 + 1)
+    if box is not None:
+        draw_coverage(image, box, get_line_coverage(box, points, width), fill)
+
+
+def antialiased_polygon(image: Image.Image, xy: Any, fill: Any) -> None:
+    points = get_points(xy)
+    box = get_box(image, points, 1)
+    if box is not None and fill is not None:
+        draw_coverage(image, box, get_polygon_coverage(box, points), fill)
+
+
+def antialiased_ellipse(image: Image.Image, bounds: Tuple[float, float, float, float], fill: Any) -> None:
+    box = get_box(image, get_points(bounds), 1)
+    if box is not None:
+        draw_coverage(image, box, get_ellipse_coverage(box, bounds), fill)
+
+
+def antialiased_rectangle(image: Image.Image, xy: Any, fill: Any = None, outline: Any = None, width: float = 1) -> None:
+    points = get_points(xy)
+    box = get_box(image, points, 1)
+    if box is None:
+        return
+
+    (x0, y0), (x1, y1) = points
+    x0, x1, y0, y1 = min(x0, x1), max(x0, x1), min(y0, y1), max(y0, y1)
+
+    outer = get_rectangle_coverage(box, (x0, y0, x1, y1))
+    if fill is not None:
+        draw_coverage(image, box, outer, fill)
+
+    if outline is not None and width > 0:
+        inner = get_rectangle_coverage(box, (x0 + width, y0 + width, x1 - width, y1 - width)) \
+            if x1 - x0 > width * 2 and y1 - y0 > width * 2 else 0
+        draw_coverage(image, box, outer - inner, outline)
@@ -1,4 +1,5 @@
 import json
+from typing import List
 
 from flask import Response
 
@@ -52,11 +53,34 @@ class NotFound(JsonException):
 
 class MethodNotAllowed(JsonException):
 
-    def __init__(self, message: str = None, extra: dict = None):
+    def __init__(self, message: str = None, extra: dict = None, allowed: List[str] = None):
         super().__init__(405, message, extra)
 
+        self.allowed = allowed
+
+    def as_response(self):
+        response = super().as_response()
+        if self.allowed:
+            response.headers["Allow"] = ", ".join(self.allowed)
+
+        return response
+
 
 class InternalError(JsonException):
 
     def __init__(self, message: str = None, extra: dict = None):
         super().__init__(500, message, extra)
+
+
+class ServiceUnavailable(JsonException):
+
+    def __init__(self, message: str = None, retry_after: int = 1):
+        super().__init__(503, message, {"retry_after": retry_after})
+
+        self.retry_after = retry_after
+
+    def as_response(self):
+        response = super().as_response()
+        response.headers["Retry-After"] = str(self.retry_after)
+
+        return response
@@ -0,0 +1,346 @@
+import base64
+import re
+from io import BytesIO
+from math import ceil, floor
+from typing import Tuple, List, Callable, Optional, Union, Any
+from xml.sax.saxutils import escape, quoteattr
+
+from PIL import Image, ImageDraw, ImageFont, ImageColor
+from flask import Response, request
+
+from utility.image import get_strip_boxes, get_image_response
+from utility.raster import SUPERSAMPLE, ANALYTIC, get_points, antialiased_rectangle, antialiased_line, \
+    antialiased_polygon
+
+# output rows made at a time, only their supersampled rows and the rows the filter reaches past them are held in memory
+SCENE_STRIP_ROWS = 64
+SCENE_STRIP_SCALE = 2
+# lanczos reaches 3 source pixels past an output pixel for every time the image is scaled down
+LANCZOS_SUPPORT = 3
+
+SVG_FORMAT = "svg"
+# characters xml can't hold at all, text from requests can have them
+INVALID_XML = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+# pillow's default gap between the lines of multiline text
+LINE_SPACING = 4
+# css weights for the style names fonts use, the longer names come first so they're found before the shorter ones in
+# them
+FONT_WEIGHTS = [("ExtraLight", 200), ("ExtraBold", 800), ("SemiBold", 600), ("Thin", 100), ("Light", 300),
+                ("Medium", 500), ("Bold", 700), ("Black", 900)]
+
+Operation = Callable[[Image.Image, ImageDraw.ImageDraw, int], None]
+Element = Callable[[], str]
+Line = Tuple[Tuple[float, float], Tuple[float, float]]
+
+
+def get_coordinates(xy: Any) -> List[float]:
+    return [value for point in get_points(xy) for value in point]
+
+
+def get_pixel_coordinates(xy: Any) -> List[int]:
+    # pillow truncates coordinates to whole pixels before drawing, doing it first means moving them by whole rows later
+    # draws exactly the same pixels
+    return [int(value) for value in get_coordinates(xy)]
+
+
+def move_up(values: List[float], rows: int) -> List[float]:
+    return [value - rows if index % 2 else value for index, value in enumerate(values)]
+
+
+def get_svg_number(value: float) -> str:
+    return f"{value:.2f}".rstrip("0").rstrip(".")
+
+
+def get_svg_points(values: List[float]) -> str:
+    return " ".join(f"{get_svg_number(x)},{get_svg_number(y)}" for x, y in zip(values[::2], values[1::2]))
+
+
+def get_svg_paint(attribute: str, colour: Any) -> str:
+    if colour is None:
+        return f' {attribute}="none"'
+
+    colour = ImageColor.getrgb(colour) if isinstance(colour, str) else tuple(colour)
+    paint = f' {attribute}="#{colour[0]:02x}{colour[1]:02x}{colour[2]:02x}"'
+    if len(colour) > 3 and colour[3] < 255:
+        paint += f' {attribute}-opacity="{get_svg_number(colour[3] / 255)}"'
+
+    return paint
+
+
+def get_svg_font(font: ImageFont.FreeTypeFont) -> str:
+    family, style = font.getname()
+    weight = next((weight for name, weight in FONT_WEIGHTS if name in (style or "")), 400)
+
+    attributes = f' font-family={quoteattr(family)} font-size="{font.size}"'
+    if weight != 400:
+        attributes += f' font-weight="{weight}"'
+    if "Italic" in (style or ""):
+        attributes += ' font-style="italic"'
+
+    return attributes
+
+
+def get_svg_text(x: float, y: float, text: str, font: ImageFont.FreeTypeFont, fill: Any, transform: str = "") -> str:
+    # pillow puts the top of the font at y where svg puts the baseline, lines after the first are spaced the same as
+    # pillow's multiline text
+    ascent, _ = font.getmetrics()
+    line_spacing = font.getsize("A")[1] + LINE_SPACING
+
+    lines = "".join(f'<tspan x="{get_svg_number(x)}" y="{get_svg_number(y + ascent + line_spacing * index)}">'
+                    f'{escape(INVALID_XML.sub("", line))}</tspan>' for index, line in enumerate(text.split("\n")))
+
+    return f'<text{transform}{get_svg_font(font)}{get_svg_paint("fill", fill)} xml:space="preserve">{lines}</text>'
+
+
+def get_svg_image(image: Image.Image, x: float, y: float) -> str:
+    b = BytesIO()
+    image.save(b, format="png")
+
+    return (f'<image x="{get_svg_number(x)}" y="{get_svg_number(y)}" width="{image.width}" height="{image.height}" '
+            f'xlink:href="data:image/png;base64,{base64.b64encode(b.getvalue()).decode()}"/>')
+
+
+def get_svg_rectangle(values: List[float], fill: Any, outline: Any, width: int) -> str:
+    x0, x1 = sorted(values[::2])
+    y0, y1 = sorted(values[1::2])
+
+    def rectangle(inset: float, attributes: str) -> str:
+        return f'<rect x="{get_svg_number(x0 + inset)}" y="{get_svg_number(y0 + inset)}" ' \
+               f'width="{get_svg_number(x1 - x0 - inset * 2)}" height="{get_svg_number(y1 - y0 - inset * 2)}"' \
+               f'{attributes}/>'
+
+    element = "" if fill is None else rectangle(0, get_svg_paint("fill", fill))
+    if outline is None or width <= 0:
+        return element
+
+    # pillow draws outlines inside the rectangle where svg centres them on its edge
+    if x1 - x0 <= width * 2 or y1 - y0 <= width * 2:
+        return element + rectangle(0, get_svg_paint("fill", outline))
+
+    return element + rectangle(width / 2, f' fill="none"{get_svg_paint("stroke", outline)} stroke-width="{width}"')
+
+
+def get_masked_image(image: Image.Image, mask: Image.Image) -> Image.Image:
+    masked = image.convert("RGBA")
+    masked.putalpha(mask.getchannel("A") if mask.mode in ("RGBA", "LA") else mask.convert("L"))
+
+    return masked
+
+
+def is_svg_requested() -> bool:
+    return (request.args.get("format") or "").lower() == SVG_FORMAT
+
+
+def get_scene_response(scene: "Scene", size: Tuple[int, int], background: Tuple[int, int, int]) -> Response:
+    if not is_svg_requested():
+        return get_image_response([scene.resize(size, background)])
+
+    response = Response(scene.as_svg(size, background), mimetype="image/svg+xml")
+    response.headers["width"] = size[0]
+    response.headers["height"] = size[1]
+    response.headers["frames"] = 1
+
+    return response
+
+
+class Scene:
+
+    def __init__(self, size: Tuple[int, int], colour: Tuple[int, int, int, int] = (0, 0, 0, 0),
+                 render_mode: str = SUPERSAMPLE):
+        self.size = size
+        self.colour = colour
+        # analytic scenes are drawn at the size they're shown at with shapes blended in by how much of a pixel they cover
+        self.analytic = render_mode == ANALYTIC
+        self.operations: List[Tuple[int, int, Union[Operation, "Scene"]]] = []
+        # the same drawing as svg, each made only if the scene is asked for as one
+        self.elements: List[Union[Element, "Scene"]] = []
+        # a scene of only lines can be composited in strips around them, anything else clears this
+        self.lines: Optional[List[Line]] = []
+        self.line_width = 0
+        self.strip_boxes: Optional[List[Tuple[int, int, int, int]]] = None
+        self.measure = ImageDraw.Draw(Image.new("L", (1, 1)))
+
+    @property
+    def render_mode(self) -> str:
+        return ANALYTIC if self.analytic else SUPERSAMPLE
+
+    @property
+    def rows(self) -> Tuple[int, int]:
+        if not self.operations:
+            return 0, 0
+
+        return min(start for start, _, _ in self.operations), max(end for _, end, _ in self.operations)
+
+    def add(self, start: float, end: float, operation: Union[Operation, "Scene"],
+            element: Union[Element, "Scene"]) -> None:
+        self.operations.append((floor(start), ceil(end), operation))
+        self.elements.append(element)
+
+    def layer(self) -> "Scene":
+        return Scene(self.size, render_mode=self.render_mode)
+
+    def coordinates(self, xy: Any) -> List[float]:
+        return get_coordinates(xy) if self.analytic else get_pixel_coordinates(xy)
+
+    def rectangle(self, xy: Any, fill: Any = None, outline: Any = None, width: int = 1) -> None:
+        values, coordinates = self.coordinates(xy), get_coordinates(xy)
+        element = lambda: get_svg_rectangle(coordinates, fill, outline, width)
+        self.lines = None
+
+        if self.analytic:
+            self.add(min(values[1::2]) - 1, max(values[1::2]) + 2,
+                     lambda image, draw, top: antialiased_rectangle(image, move_up(values, top), fill, outline, width),
+                     element)
+        else:
+            self.add(min(values[1::2]), max(values[1::2]) + 1,
+                     lambda image, draw, top: draw.rectangle(move_up(values, top), fill, outline, width), element)
+
+    def line(self, xy: Any, fill: Any = None, width: int = 0) -> None:
+        values, coordinates = self.coordinates(xy), get_coordinates(xy)
+        if self.lines is not None:
+            points = list(zip(values[::2], values[1::2]))
+            self.lines += zip(points, points[1:])
+            self.line_width = max(self.line_width, width)
+
+        element = lambda: f'<polyline points="{get_svg_points(coordinates)}" fill="none"' \
+                          f'{get_svg_paint("stroke", fill)} stroke-width="{width or 1}" stroke-linecap="round"' \
+                          f' stroke-linejoin="round"/>'
+
+        if self.analytic:
+            self.add(min(values[1::2]) - width - 2, max(values[1::2]) + width + 2,
+                     lambda image, draw, top: antialiased_line(image, move_up(values, top), fill, width), element)
+        else:
+            self.add(min(values[1::2]) - width, max(values[1::2]) + width + 1,
+                     lambda image, draw, top: draw.line(move_up(values, top), fill, width), element)
+
+    def polygon(self, xy: Any, fill: Any = None) -> None:
+        values, coordinates = self.coordinates(xy), get_coordinates(xy)
+        element = lambda: f'<polygon points="{get_svg_points(coordinates)}"{get_svg_paint("fill", fill)}/>'
+        self.lines = None
+
+        if self.analytic:
+            self.add(min(values[1::2]) - 1, max(values[1::2]) + 2,
+                     lambda image, draw, top: antialiased_polygon(image, move_up(values, top), fill), element)
+        else:
+            self.add(min(values[1::2]), max(values[1::2]) + 1,
+                     lambda image, draw, top: draw.polygon(move_up(values, top), fill), element)
+
+    def text(self, xy: Tuple[float, float], text: str, font: ImageFont.FreeTypeFont, fill: Any = None) -> None:
+        # only rows are moved, a whole row keeps the glyphs on the same pixels as long as they start inside the image
+        x, y = xy[0], floor(xy[1]) if xy[1] >= 0 else xy[1]
+        self.lines = None
+
+        _, start, _, end = self.measure.textbbox((x, y), text, font)
+        self.add(floor(start) - 2, ceil(end) + 2, lambda image, draw, top: draw.text((x, y - top), text, fill, font),
+                 lambda: get_svg_text(xy[0], xy[1], text, font, fill))
+
+    def vertical_text(self, xy: Tuple[int, int], text: str, font: ImageFont.FreeTypeFont, fill: Any = None) -> None:
+        # text read downwards with its top facing right, xy is the top left of the space it takes up
+        width, height = font.getsize(text)
+        x, y = xy
+        self.lines = None
+
+        text_image = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+        ImageDraw.Draw(text_image).text((0, 0), text, font=font, fill=fill)
+        text_image = text_image.rotate(270, expand=1)
+
+        transform = f' transform="translate({get_svg_number(x + height)} {get_svg_number(y)}) rotate(90)"'
+        self.add(y, y + text_image.height, lambda image, draw, top: image.paste(text_image, (x, y - top)),
+                 lambda: get_svg_text(0, 0, text, font, fill, transform))
+
+    def paste(self, im: Image.Image, xy: Tuple[int, int], mask: Image.Image = None) -> None:
+        x, y = xy
+        self.lines = None
+
+        self.add(y, y + im.height, lambda image, draw, top: image.paste(im, (x, y - top), mask),
+                 lambda: get_svg_image(im if mask is None else get_masked_image(im, mask), x, y))
+
+    def alpha_composite(self, scene: "Scene") -> None:
+        self.lines = None
+
+        self.add(*scene.rows, scene, scene)
+
+    def draw(self, image: Image.Image, top: int) -> None:
+        draw = ImageDraw.Draw(image)
+        bottom = top + image.height
+
+        layer = None
+        for start, end, operation in self.operations:
+            if start >= bottom or end <= top:
+                continue
+
+            if isinstance(operation, Scene):
+                if layer is None:
+                    layer = Image.new("RGBA", image.size, 0)
+
+                operation.composite(image, layer, top)
+            else:
+                operation(image, draw, top)
+
+    def composite(self, image: Image.Image, layer: Image.Image, top: int) -> None:
+        # layer is a cleared image the size of image, it's drawn on and cleared again
+        self.draw(layer, top)
+
+        if self.lines is None:
+            image.alpha_composite(layer)
+            layer.paste(0, (0, 0) + layer.size)
+            return
+
+        # the boxes are found once for the whole scene, each strip only takes the rows of them inside it
+        if self.strip_boxes is None:
+            self.strip_boxes = get_strip_boxes(self.lines, self.line_width + 2, self.size)
+
+        for left, box_top, right, box_bottom in self.strip_boxes:
+            box = (left, max(0, box_top - top), right, min(image.height, box_bottom - top))
+            if box[1] < box[3]:
+                image.alpha_composite(layer, box[:2], box)
+                layer.paste(0, box)
+
+    def svg(self) -> str:
+        return "".join(f"<g>{element.svg()}</g>" if isinstance(element, Scene) else element() for element in self.elements)
+
+    def as_svg(self, size: Tuple[int, int], background: Tuple[int, int, int]) -> str:
+        # the scene is stretched to size the same way resizing it would
+        canvas = "" if len(self.colour) > 3 and self.colour[3] == 0 else \
+            f'<rect width="100%" height="100%"{get_svg_paint("fill", self.colour)}/>'
+
+        return f'<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" ' \
+               f'width="{size[0]}" height="{size[1]}" viewBox="0 0 {self.size[0]} {self.size[1]}" ' \
+               f'preserveAspectRatio="none"><rect width="100%" height="100%"{get_svg_paint("fill", background)}/>' \
+               f'{canvas}{self.svg()}</svg>'
+
+    def render(self, top: int, bottom: int) -> Image.Image:
+        image = Image.new("RGBA", (self.size[0], bottom - top), self.colour)
+        self.draw(image, top)
+
+        return image
+
+    def resize(self, size: Tuple[int, int], background: Tuple[int, int, int],
+               strip_rows: int = SCENE_STRIP_ROWS) -> Image.Image:
+        # the same as rendering the whole scene, resizing it with lanczos and pasting it over background, but only a
+        # strip is drawn at once. every output row is made from the same source rows with the same weights either way
+        scale = self.size[1] / size[1]
+        reach = ceil(LANCZOS_SUPPORT * scale) + 1
+        # pillow copies an image resized to its own size instead of filtering it
+        resampled = size != self.size
+
+        # strips only save memory when the scene is drawn a lot bigger than it's shown, otherwise they just mean drawing
+        # everything that crosses them again
+        if scale < SCENE_STRIP_SCALE:
+            strip_rows = size[1]
+
+        final_image = Image.new("RGB", size, background)
+        for output_top in range(0, size[1], strip_rows):
+            output_bottom = min(size[1], output_top + strip_rows)
+
+            top = max(0, floor(output_top * scale) - reach)
+            bottom = min(self.size[1], ceil(output_bottom * scale) + reach)
+
+            strip = self.render(top, bottom)
+            if resampled:
+                strip = strip.resize((size[0], output_bottom - output_top), Image.LANCZOS,
+                                     (0, output_top * scale - top, self.size[0], output_bottom * scale - top))
+
+            final_image.paste(strip, (0, output_top), strip)
+
+        return final_image
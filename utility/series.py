@@ -0,0 +1,51 @@
+from typing import List
+
+import numpy as np
+
+
+def get_largest_triangle_indexes(values: List[float], budget: int) -> List[int]:
+    # largest triangle three buckets, the first and last points are kept and from each bucket between them the one
+    # making the biggest triangle with the point kept before it and the middle of the next bucket
+    length = len(values)
+    if length <= budget or budget < 3:
+        return list(range(length))
+
+    ys = np.asarray(values, dtype=np.float64)
+    edges = [bucket * (length - 2) // (budget - 2) + 1 for bucket in range(budget - 1)] + [length]
+
+    # the middle of every bucket after the first, the last point is a bucket of its own
+    sums = np.add.reduceat(ys, edges[1:-1])
+    counts = np.diff(edges[1:])
+    middles_x = (np.array(edges[1:-1]) + np.array(edges[2:]) - 1) / 2
+    middles_y = sums / counts
+
+    indexes = [0]
+    for bucket in range(budget - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        previous_x, previous_y = indexes[-1], ys[indexes[-1]]
+
+        xs = np.arange(start, end)
+        areas = np.abs((previous_x - middles_x[bucket]) * (ys[start:end] - previous_y) -
+                       (previous_x - xs) * (middles_y[bucket] - previous_y))
+        indexes.append(start + int(np.argmax(areas)))
+
+    indexes.append(length - 1)
+    return indexes
+
+
+def get_descending_ranks(values: np.ndarray) -> np.ndarray:
+    # where each value of a row first shows up with the row sorted biggest first, which is how many values in it are
+    # bigger. nan values are left out and put last
+    filled = np.where(np.isnan(values), -np.inf, values)
+    order = np.argsort(-filled, axis=1, kind="stable")
+    ordered = np.take_along_axis(filled, order, axis=1)
+
+    positions = np.broadcast_to(np.arange(values.shape[1]), values.shape)
+    changes = np.ones(values.shape, dtype=bool)
+    changes[:, 1:] = ordered[:, 1:] != ordered[:, :-1]
+    firsts = np.maximum.accumulate(np.where(changes, positions, 0), axis=1)
+
+    ranks = np.empty(values.shape, dtype=np.int64)
+    np.put_along_axis(ranks, order, firsts, axis=1)
+
+    return ranks